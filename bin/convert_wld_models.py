@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from maya_convertor_from_binary import convert_nodes, model_to_maya
+from wld_index import WldIndex
+from wld_models import WldFile, aligned_name_end, parse_model_header
+
+
+def model_folder_paths(world: WldFile, base: str) -> List[str]:
+    """Пути каталогов по дереву GROU, как в SystemFolderManager#convert_folder.
+
+    Элемент 0 — корень (parent_folder_id == 1), элемент k — папка с id k + 1.
+    """
+    folders = []
+    for offset, _length, name in world.index.items('GROU'):
+        pos = aligned_name_end(world.data, offset + 4)
+        folders.append({'name': name, 'parent_folder_id': struct.unpack_from("<i", world.data, pos)[0]})
+
+    paths = [base]
+    for folder in folders:
+        tree = [folder['name']]
+        seen = 0
+        while folder['parent_folder_id'] != 1 and seen < len(folders):
+            folder = folders[folder['parent_folder_id'] - 2]
+            tree.append(folder['name'])
+            seen += 1
+        paths.append(os.path.join(base, *reversed(tree)))
+    return paths
+
+
+# ------------------------------ worker ------------------------------
+
+_worker_world: Optional[WldFile] = None
+
+
+def _init_worker(wld_path: str, index_hash: Dict[str, Any]):
+    # каждый процесс отображает тот же файл; страницы делит кэш ОС
+    global _worker_world
+    _worker_world = WldFile(wld_path, WldIndex(index_hash['sections'], index_hash['source']))
+
+
+def convert_model(model_id: int, output_path: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    result: Dict[str, Any] = {'id': model_id, 'output': output_path}
+    try:
+        nodes_raw = _worker_world.unpack_model(model_id)
+        scene = model_to_maya(convert_nodes(nodes_raw))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as io:
+            io.write(scene)
+        result['nodes'] = len(nodes_raw)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - t0
+    return result
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Convert every model of a WLD file to Maya ASCII (.ma)")
+    parser.add_argument('world', help="path to the .wld file")
+    parser.add_argument('-o', '--output', help="output directory (default: <world>_models)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--report', help="write the per-model report as JSON to this file")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    output = args.output or os.path.splitext(args.world)[0] + "_models"
+    index = WldIndex.open(args.world)
+
+    tasks = []
+    with WldFile(args.world, index) as world:
+        folders = model_folder_paths(world, output)
+        for position, (offset, _length, _name) in enumerate(index.items('LIST')):
+            info = parse_model_header(world.data, offset)
+            model_id = WldFile.model_id(position)
+            folder = folders[info['parent_folder_iid'] - 1]
+            tasks.append((model_id, info['name'], os.path.join(folder, f"{info['name']}_{model_id}.ma")))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker,
+                             initargs=(args.world, index.to_hash())) as pool:
+        futures = {pool.submit(convert_model, model_id, path): name for model_id, name, path in tasks}
+        for future in as_completed(futures):
+            res = future.result()
+            res['name'] = futures[future]
+            results.append(res)
+
+    results.sort(key=lambda r: r['id'])
+    failed = [r for r in results if 'error' in r]
+    for r in results:
+        status = f"ERROR {r['error']}" if 'error' in r else f"{r['nodes']} nodes"
+        print(f"{r['id']:>6}  {r['seconds'] * 1000.0:9.1f} ms  {r['name']}  {status}")
+
+    total = time.perf_counter() - t0
+    slowest = sorted(results, key=lambda r: r['seconds'], reverse=True)[:5]
+    print(f"\nConverted {len(results) - len(failed)}/{len(results)} models into {output} in {total:.2f}s")
+    if slowest:
+        print("Slowest: " + ", ".join(f"{r['name']} ({r['seconds'] * 1000.0:.0f} ms)" for r in slowest))
+    if failed:
+        print(f"Failed: {len(failed)}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as io:
+            json.dump({'world': args.world, 'seconds': total, 'models': results}, io, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from texture_codec import decode_pixels, encode_pixels, parse_page, write_dds, write_png, x_bits
+from wld_index import WldIndex
+from wld_models import WldFile
+
+MANIFEST_NAME = "textures_manifest.json"
+
+
+def texture_output_path(filepath: str, ext: str) -> str:
+    """'C:\\TheSting\\textures\\wall.tif' → 'TheSting/textures/wall.<ext>' (относительный путь).
+
+    Пути с '..' или диском не в начале отклоняются: результат всегда лежит внутри output.
+    """
+    parts = [p for p in filepath.replace('/', '\\').split('\\') if p and p != '.']
+    if parts and parts[0].endswith(':'):
+        parts = parts[1:]  # буква диска
+    if any(p == '..' or ':' in p for p in parts):
+        raise RuntimeError(f"Texture filepath escapes the output directory: '{filepath}'")
+    if not parts:
+        parts = ['unnamed']
+    stem = os.path.splitext(parts[-1])[0] or 'unnamed'
+    return os.path.join(*parts[:-1], stem + ext)
+
+
+def box_in_page(box: Dict[str, int], page: Dict[str, Any]) -> bool:
+    return 0 <= box['x0'] < box['x2'] <= page['width'] and 0 <= box['y0'] < box['y2'] <= page['height']
+
+
+def assign_outputs(pages: List[Dict[str, Any]], ext: str):
+    """Выходной путь для каждой текстуры всех страниц.
+
+    Одинаковые filepath + box/source_box пишутся один раз; если один filepath лежит
+    на страницах в разных прямоугольниках, к имени добавляется __<page id>
+    (как в normalize_textures_filepath.rb), а если таких прямоугольников несколько
+    на одной странице — ещё и _<x0>_<y0>_<x2>_<y2> прямоугольника.
+    Пустой или выходящий за страницу box получает output None: файла у него нет.
+    """
+    variants: Dict[str, List[tuple]] = {}
+    on_page: Dict[tuple, set] = {}
+    for page in pages:
+        for tex in page['textures']:
+            if not box_in_page(tex['box'], page):
+                continue
+            name = tex['filepath'].lower()
+            key = (tuple(tex['box'].values()), tuple(tex['source_box'].values()))
+            seen = variants.setdefault(name, [])
+            if key not in seen:
+                seen.append(key)
+            on_page.setdefault((name, page['id']), set()).add(key[0])
+
+    written = set()
+    for page in pages:
+        for tex in page['textures']:
+            if not box_in_page(tex['box'], page):
+                tex['output'], tex['write'] = None, False
+                continue
+            name = tex['filepath'].lower()
+            base = texture_output_path(tex['filepath'], ext)
+            if len(variants[name]) > 1:
+                stem, e = os.path.splitext(base)
+                suffix = f"__{page['id']}"
+                if len(on_page[(name, page['id'])]) > 1:
+                    suffix += '_' + '_'.join(str(v) for v in tex['box'].values())
+                base = f"{stem}{suffix}{e}"
+            tex['output'] = base
+            tex['write'] = base.lower() not in written
+            written.add(base.lower())
+
+
+# ------------------------------ worker ------------------------------
+
+_worker_world: Optional[WldFile] = None
+
+
+def _init_worker(wld_path: str, index_hash: Dict[str, Any]):
+    global _worker_world
+    _worker_world = WldFile(wld_path, WldIndex(index_hash['sections'], index_hash['source']))
+
+
+def extract_page(offset: int, textures: List[Dict[str, Any]], output: str, fmt: str) -> Dict[str, Any]:
+    """Декодирует страницу один раз и пишет её под-текстуры срезами массива."""
+    t0 = time.perf_counter()
+    page = parse_page(_worker_world.data, offset)
+    start = page['pixels_offset']
+    pixels = _worker_world.view[start:start + page['pixels_length']]
+    try:
+        rgba = decode_pixels(pixels, page['width'], page['height'], page['is_alpha'])
+        x = x_bits(pixels, page['width'], page['height']) if fmt == 'dds' and not page['is_alpha'] else None
+    finally:
+        pixels.release()
+
+    count = 0
+    for tex in textures:
+        if not tex['write']:
+            continue
+        box = tex['box']
+        crop = rgba[box['y0']:box['y2'], box['x0']:box['x2']]
+        path = os.path.join(output, tex['output'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == 'dds':
+            x_crop = x[box['y0']:box['y2'], box['x0']:box['x2']] if x is not None else None
+            write_dds(path, encode_pixels(crop, page['is_alpha'], x_crop), crop.shape[1], crop.shape[0], page['is_alpha'])
+        else:
+            write_png(path, crop)
+        count += 1
+    return {'id': page['id'], 'written': count, 'seconds': time.perf_counter() - t0}
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Extract every sub-texture of every TEXP page of a WLD file")
+    parser.add_argument('world', help="path to the .wld file")
+    parser.add_argument('-o', '--output', help="output directory (default: <world>_textures)")
+    parser.add_argument('-f', '--format', choices=('png', 'dds'), default='png')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help="worker processes")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    output = args.output or os.path.splitext(args.world)[0] + "_textures"
+    index = WldIndex.open(args.world)
+
+    pages = []
+    with WldFile(args.world, index) as world:
+        for offset, _length in index.items('TEXP'):
+            page = parse_page(world.data, offset)
+            page['offset'] = offset
+            pages.append(page)
+    assign_outputs(pages, '.' + args.format)
+
+    os.makedirs(output, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker,
+                             initargs=(args.world, index.to_hash())) as pool:
+        futures = [pool.submit(extract_page, page['offset'], page['textures'], output, args.format)
+                   for page in pages]
+        results = [f.result() for f in futures]
+
+    # манифест: всё, что нужно, чтобы собрать страницы обратно
+    manifest = [{
+        'id': page['id'], 'width': page['width'], 'height': page['height'], 'is_alpha': page['is_alpha'],
+        'textures': [{'filepath': t['filepath'], 'box': t['box'], 'source_box': t['source_box'],
+                      'output': t['output'] and t['output'].replace(os.sep, '/')} for t in page['textures']],
+    } for page in pages]
+    with open(os.path.join(output, MANIFEST_NAME), 'w', encoding='utf-8') as io:
+        json.dump(manifest, io, ensure_ascii=False, indent=2)
+
+    written = sum(r['written'] for r in results)
+    total = sum(len(p['textures']) for p in pages)
+    print(f"Extracted {written} files ({total} texture entries) from {len(pages)} pages into {output} "
+          f"in {time.perf_counter() - t0:.2f}s")
+    for page in pages:
+        for tex in page['textures']:
+            if tex['output'] is None:
+                print(f"  page {page['id']}: '{tex['filepath']}' has an empty or out-of-page box "
+                      f"{list(tex['box'].values())}, not extracted (output: null in the manifest)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
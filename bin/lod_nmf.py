@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import copy
+import heapq
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from maya_convert_common import WELD_TOLERANCE, weld_vertices
+from maya_convertor_from_binary import convert_nodes, model_to_maya
+from unpack_nmf import Nmf
+
+# вес плоскостей вдоль границ и швов UV относительно плоскостей треугольников
+BOUNDARY_WEIGHT = 10.0
+
+
+def triangle_normal(p0, p1, p2) -> Tuple[float, float, float]:
+    ax, ay, az = p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2]
+    bx, by, bz = p2[0] - p0[0], p2[1] - p0[1], p2[2] - p0[2]
+    return ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+
+
+class QuadricSimplifier:
+    """Упрощение MESH половинными стягиваниями рёбер по квадрикам (Garland, Heckbert 1997).
+
+    Строка vbuf — «клин» (wedge): позиция + нормаль + UV. Стягивание идёт по сваренным
+    позициям, а у каждого клина удаляемой вершины должен найтись клин-пара у оставшейся
+    в треугольниках общего ребра. Поэтому вершина шва UV (материала) двигается только
+    вдоль шва, вершина открытой границы — только вдоль границы, а узлы, где сходятся
+    три клина и больше, не двигаются вовсе.
+    """
+
+    def __init__(self, vbuf: np.ndarray, ibuf: np.ndarray, weld_tolerance: float = WELD_TOLERANCE):
+        self.vbuf = vbuf
+        positions, self.pid = weld_vertices(vbuf[:, 0:3].astype(np.float64), weld_tolerance)
+        self.positions = positions
+        self.tris: List[List[int]] = ibuf.tolist()
+        self.corner_pid: List[List[int]] = self.pid[ibuf].tolist()
+        self.alive = [len(set(c)) == 3 for c in self.corner_pid]
+        self.live_count = sum(self.alive)
+        self.vertex_tris: List[Set[int]] = [set() for _ in range(len(positions))]
+        for t, corners in enumerate(self.corner_pid):
+            if self.alive[t]:
+                for p in corners:
+                    self.vertex_tris[p].add(t)
+        quadrics = self._initial_quadrics()
+        # дальше всё поштучно: квадрика — 10 коэффициентов симметричной 4x4, точки — кортежи
+        upper = np.triu_indices(4)
+        self.quadrics: List[List[float]] = quadrics[:, upper[0], upper[1]].tolist()
+        self.points: List[Tuple[float, float, float]] = [tuple(p) for p in positions.tolist()]
+        self.version = [0] * len(positions)
+        self.max_error = 0.0
+        self.heap = self._initial_heap(quadrics)
+
+    # ---- квадрики ----
+
+    def _initial_quadrics(self) -> np.ndarray:
+        live = np.flatnonzero(self.alive)
+        corners = np.asarray(self.corner_pid, dtype=np.int64).reshape(-1, 3)[live]
+        p = self.positions[corners]
+        normal = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        length = np.linalg.norm(normal, axis=1)
+        normal = normal / np.maximum(length, 1e-12)[:, None]
+        planes = np.concatenate([normal, -np.einsum('ij,ij->i', normal, p[:, 0])[:, None]], axis=1)
+        per_tri = planes[:, :, None] * planes[:, None, :]
+        quadrics = np.zeros((len(self.positions), 4, 4))
+        for k in range(3):
+            np.add.at(quadrics, corners[:, k], per_tri)
+
+        # граница и шов: плоскость через ребро перпендикулярно треугольнику
+        wedges = np.asarray(self.tris, dtype=np.int64).reshape(-1, 3)[live]
+        a, b = corners.reshape(-1), corners[:, [1, 2, 0]].reshape(-1)
+        wa, wb = wedges.reshape(-1), wedges[:, [1, 2, 0]].reshape(-1)
+        swap = a > b
+        lo, hi = np.where(swap, b, a), np.where(swap, a, b)
+        wlo, whi = np.where(swap, wb, wa), np.where(swap, wa, wb)
+        _, edge, count = np.unique(np.stack([lo, hi], axis=1), axis=0, return_inverse=True, return_counts=True)
+        edge = edge.reshape(-1)
+        # у ребра без шва оба треугольника ссылаются на одни и те же клины
+        order = np.argsort(edge, kind='stable')
+        first = np.full(len(count), -1, dtype=np.int64)
+        first[edge[order[::-1]]] = order[::-1]
+        same = (wlo == wlo[first[edge]]) & (whi == whi[first[edge]])
+        differs = np.zeros(len(count), dtype=bool)
+        np.logical_or.at(differs, edge, ~same)
+        crease = (count[edge] != 2) | differs[edge]
+
+        tri_normal = np.repeat(normal, 3, axis=0)[crease]
+        pa, pb = self.positions[a[crease]], self.positions[b[crease]]
+        side = np.cross(pb - pa, tri_normal)
+        norm = np.linalg.norm(side, axis=1)
+        keep = norm > 1e-12
+        side = side[keep] / norm[keep][:, None]
+        planes = np.concatenate([side, -np.einsum('ij,ij->i', side, pa[keep])[:, None]], axis=1)
+        per_edge = BOUNDARY_WEIGHT * planes[:, :, None] * planes[:, None, :]
+        np.add.at(quadrics, a[crease][keep], per_edge)
+        np.add.at(quadrics, b[crease][keep], per_edge)
+        return quadrics
+
+    def _initial_heap(self, quadrics: np.ndarray) -> List[Tuple[float, int, int, int, int]]:
+        corners = np.asarray(self.corner_pid, dtype=np.int64).reshape(-1, 3)[np.asarray(self.alive, dtype=bool)]
+        edges = np.concatenate([corners[:, [0, 1]], corners[:, [1, 2]], corners[:, [2, 0]]])
+        edges = np.unique(np.concatenate([edges, edges[:, ::-1]]), axis=0)
+        x = np.concatenate([self.positions[edges[:, 1]], np.ones((len(edges), 1))], axis=1)
+        q = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+        errors = np.maximum(np.einsum('ei,eij,ej->e', x, q, x), 0.0)
+        heap = [(e, u, v, 0, 0) for e, (u, v) in zip(errors.tolist(), edges.tolist())]
+        heapq.heapify(heap)
+        return heap
+
+    def _collapse_error(self, u: int, v: int) -> float:
+        a, b, c, d, e, f, g, h, i, j = (qu + qv for qu, qv in zip(self.quadrics[u], self.quadrics[v]))
+        x, y, z = self.points[v]
+        error = (a * x * x + 2.0 * b * x * y + 2.0 * c * x * z + 2.0 * d * x
+                 + e * y * y + 2.0 * f * y * z + 2.0 * g * y
+                 + h * z * z + 2.0 * i * z + j)
+        return max(error, 0.0)
+
+    # ---- топология ----
+
+    def _wedge_at(self, t: int, p: int) -> int:
+        return self.tris[t][self.corner_pid[t].index(p)]
+
+    def _neighbors(self, p: int) -> Set[int]:
+        out = set()
+        for t in self.vertex_tris[p]:
+            out.update(self.corner_pid[t])
+        out.discard(p)
+        return out
+
+    def _wedge_map(self, u: int, v: int, shared: Set[int]) -> Optional[Dict[int, int]]:
+        """Клин u → клин v; None, если какой-то клин u не проходит через ребро (u, v)."""
+        mapping: Dict[int, int] = {}
+        for t in shared:
+            wu, wv = self._wedge_at(t, u), self._wedge_at(t, v)
+            if mapping.setdefault(wu, wv) != wv:
+                return None
+        for t in self.vertex_tris[u]:
+            if self._wedge_at(t, u) not in mapping:
+                return None
+        return mapping
+
+    def _is_border(self, p: int) -> bool:
+        return any(len(self.vertex_tris[p] & self.vertex_tris[n]) == 1 for n in self._neighbors(p))
+
+    def _flips(self, u: int, v: int, shared: Set[int]) -> bool:
+        target = self.points[v]
+        for t in self.vertex_tris[u] - shared:
+            p = [self.points[c] for c in self.corner_pid[t]]
+            before = triangle_normal(*p)
+            p[self.corner_pid[t].index(u)] = target
+            after = triangle_normal(*p)
+            dot = before[0] * after[0] + before[1] * after[1] + before[2] * after[2]
+            if dot <= 1e-12 * (before[0] * before[0] + before[1] * before[1] + before[2] * before[2]):
+                return True
+        return False
+
+    def _collapse_mapping(self, u: int, v: int) -> Optional[Dict[int, int]]:
+        shared = self.vertex_tris[u] & self.vertex_tris[v]
+        if not shared:
+            return None
+        # условие связности: общие соседи — только вершины треугольников ребра
+        opposite = {c for t in shared for c in self.corner_pid[t]} - {u, v}
+        if self._neighbors(u) & self._neighbors(v) != opposite:
+            return None
+        if len(shared) != 1 and self._is_border(u):
+            return None
+        mapping = self._wedge_map(u, v, shared)
+        if mapping is None or self._flips(u, v, shared):
+            return None
+        return mapping
+
+    def _push_edges(self, p: int):
+        for n in self._neighbors(p):
+            heapq.heappush(self.heap, (self._collapse_error(p, n), p, n, self.version[p], self.version[n]))
+            heapq.heappush(self.heap, (self._collapse_error(n, p), n, p, self.version[n], self.version[p]))
+
+    # ---- стягивание ----
+
+    def _collapse(self, u: int, v: int, mapping: Dict[int, int]):
+        for t in list(self.vertex_tris[u]):
+            corners = self.corner_pid[t]
+            if v in corners:
+                self.alive[t] = False
+                self.live_count -= 1
+                for c in corners:
+                    self.vertex_tris[c].discard(t)
+                continue
+            k = corners.index(u)
+            corners[k] = v
+            self.tris[t][k] = mapping[self.tris[t][k]]
+            self.vertex_tris[v].add(t)
+        self.vertex_tris[u].clear()
+        self.quadrics[v] = [qu + qv for qu, qv in zip(self.quadrics[u], self.quadrics[v])]
+        self.version[u] += 1
+        self.version[v] += 1
+        self._push_edges(v)
+
+    def simplify(self, target_triangles: int) -> int:
+        while self.live_count > target_triangles and self.heap:
+            error, u, v, ver_u, ver_v = heapq.heappop(self.heap)
+            if ver_u != self.version[u] or ver_v != self.version[v] or not self.vertex_tris[u]:
+                continue
+            mapping = self._collapse_mapping(u, v)
+            if mapping is None:
+                continue
+            self._collapse(u, v, mapping)
+            self.max_error = max(self.max_error, math.sqrt(error))
+        return self.live_count
+
+    def mesh(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(ibuf по исходным строкам vbuf, используемые строки vbuf по порядку)."""
+        tris = np.asarray([self.tris[t] for t in range(len(self.tris)) if self.alive[t]], dtype=np.int64).reshape(-1, 3)
+        used = np.unique(tris)
+        return tris, used
+
+
+def lod_mesh_data(data: Dict[str, Any], tris: np.ndarray, used: np.ndarray) -> Dict[str, Any]:
+    """Копия данных MESH с ibuf уровня и только используемыми строками vbuf/uvpt."""
+    out = copy.deepcopy({k: v for k, v in data.items() if k not in ('vbuf', 'uvpt', 'ibuf')})
+    remap = np.full(len(data['vbuf']), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    out['vbuf'] = np.asarray(data['vbuf'], dtype=np.float32).reshape(-1, 10)[used].tolist()
+    out['uvpt'] = np.asarray(data['uvpt'], dtype=np.float32).reshape(-1, 2)[used].tolist()
+    out['ibuf'] = remap[tris].tolist()
+    return out
+
+
+def skip_reason(data: Dict[str, Any]) -> Optional[str]:
+    """Меш с данными неизвестного смысла поверх vbuf/ibuf не трогаем: файлы уровней идут обратно в игру."""
+    if data.get('unknown_ints'):
+        return 'unknown_ints'  # разметка поверх ibuf (стрипы / сабмеши?)
+    if data.get('mesh_anim'):
+        return 'mesh_anim'  # unknown_ints кадров — индексы вершин лишь по догадке
+    return None
+
+
+def build_lods(nodes: List[Dict[str, Any]], ratios: List[float],
+               weld_tolerance: float = WELD_TOLERANCE) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Уровни детализации для всех MESH: [(узлы уровня, статистика по мешам)] по убыванию ratio.
+
+    Уровни строятся последовательно одним упростителем на меш; seconds — время своего
+    уровня (у первого в него входит построение квадрик и очереди рёбер).
+    """
+    ratios = sorted(ratios, reverse=True)
+    levels = [(copy.deepcopy(nodes), []) for _ in ratios]
+    for position, node in enumerate(nodes):
+        if node['word'] != 'MESH' or not node['data'].get('ibuf'):
+            continue
+        data = node['data']
+        skipped = skip_reason(data)
+        if skipped:
+            for _level_nodes, stats in levels:
+                stats.append({'name': node['name'], 'skipped': skipped})
+            continue
+        t0 = time.perf_counter()
+        simplifier = QuadricSimplifier(np.asarray(data['vbuf'], dtype=np.float64).reshape(-1, 10),
+                                       np.asarray(data['ibuf'], dtype=np.int64).reshape(-1, 3), weld_tolerance)
+        source = len(data['ibuf'])
+        for ratio, (level_nodes, stats) in zip(ratios, levels):
+            reached = simplifier.simplify(int(math.ceil(source * ratio)))
+            tris, used = simplifier.mesh()
+            level_nodes[position]['data'] = lod_mesh_data(data, tris, used)
+            stats.append({'name': node['name'], 'ratio': ratio, 'source': source, 'triangles': reached,
+                          'vertices': len(used), 'max_error': simplifier.max_error,
+                          'seconds': time.perf_counter() - t0})
+            t0 = time.perf_counter()
+    return levels
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Generate quadric-simplified LODs of NMF meshes")
+    parser.add_argument('input', help="source .nmf")
+    parser.add_argument('-r', '--ratio', type=float, nargs='+', default=[0.5, 0.25], help="target triangle ratios")
+    parser.add_argument('-f', '--format', choices=('nmf', 'ma'), default='nmf')
+    parser.add_argument('-o', '--output', help="output directory (default: next to the input)")
+    parser.add_argument('--weld', type=float, default=WELD_TOLERANCE, help="position weld tolerance")
+    args = parser.parse_args(argv[1:])
+    if any(not 0.0 < r <= 1.0 for r in args.ratio):
+        parser.error("ratios must be in (0, 1]")
+
+    nmf = Nmf()
+    nodes = nmf.unpack(args.input)
+    out_dir = args.output or os.path.dirname(os.path.abspath(args.input))
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(args.input))[0]
+
+    for level, (level_nodes, stats) in enumerate(build_lods(nodes, args.ratio, args.weld), start=1):
+        path = os.path.join(out_dir, f"{base}_lod{level}.{args.format}")
+        if args.format == 'nmf':
+            nmf.pack_file(level_nodes, path)
+        else:
+            with open(path, 'w', encoding='utf-8') as io:
+                io.write(model_to_maya(convert_nodes(level_nodes, args.weld)))
+        print(f"LOD{level} -> {path}")
+        for s in stats:
+            if s.get('skipped'):
+                print(f"  {s['name']}: skipped (mesh has {s['skipped']})")
+                continue
+            print(f"  {s['name']}: {s['source']} -> {s['triangles']} tris (target {s['ratio']:.2f}), "
+                  f"{s['vertices']} verts, max error {s['max_error']:.5f}, {s['seconds'] * 1000.0:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
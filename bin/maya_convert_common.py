@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Общие шаги конвертеров в Maya ASCII (maya_convertor.py — из JSON,
+# maya_convertor_from_binary.py — из бинарного NMF) над уже сконвертированными узлами.
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# ------------------------------ joint orient ------------------------------
+
+def matrices_rowmajor_to_euler_xyz(matrices) -> np.ndarray:
+    """(n, 4, 4) матрицы (вектор-строка) → (n, 3) углы XYZ в градусах.
+
+    Раскладывается транспонированная 3x3: rij = m[j][i], как в Ruby-конвертере;
+    при |r20| ~ 1 (gimbal lock) z = 0.
+    """
+    m = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    r20 = m[:, 0, 2]
+    regular = np.abs(r20) < 0.999999
+    y = np.arcsin(np.clip(-r20, -1.0, 1.0))
+    # вне gimbal: x = atan2(r21, r22), z = atan2(r10, r00); иначе x = atan2(-r12, r11), z = 0
+    x = np.where(regular, np.arctan2(m[:, 1, 2], m[:, 2, 2]), np.arctan2(-m[:, 2, 1], m[:, 1, 1]))
+    z = np.where(regular, np.arctan2(m[:, 0, 1], m[:, 0, 0]), 0.0)
+    return np.degrees(np.stack([x, y, z], axis=1))
+
+
+def joint_orients(joints: List[Dict[str, Any]]) -> List[List[float]]:
+    """joint orient (градусы) для данных нескольких JOIN одним пакетом; без rotation_matrix — нули."""
+    out = [[0.0, 0.0, 0.0] for _ in joints]
+    with_matrix = [i for i, data in enumerate(joints) if data.get('rotation_matrix')]
+    angles = matrices_rowmajor_to_euler_xyz([joints[i]['rotation_matrix'] for i in with_matrix])
+    for i, orient in zip(with_matrix, angles.tolist()):
+        out[i] = orient
+    return out
+
+
+# ------------------------------ сокращение ключей ------------------------------
+
+# допуск по умолчанию: единицы сцены, градусы, множитель масштаба
+KEY_TOLERANCES = {'translation': 0.001, 'rotation': 0.01, 'scaling': 0.001}
+
+
+def reduce_curve(frames: np.ndarray, values: np.ndarray, tolerance: float) -> np.ndarray:
+    """Маска оставляемых ключей кривой с линейной интерполяцией.
+
+    За проход для каждого внутреннего ключа считается максимальная ошибка всех исходных
+    ключей между его соседями, если его убрать; убираются не соседние друг с другом
+    ключи с ошибкой <= tolerance. Проходы повторяются, пока есть что убрать.
+    """
+    n = len(frames)
+    keep = np.ones(n, dtype=bool)
+    if n <= 2:
+        return keep
+    while True:
+        kept = np.flatnonzero(keep)
+        if len(kept) <= 2:
+            return keep
+        prev, nxt = kept[:-2], kept[2:]
+        # все исходные ключи в окнах [prev, next] одним массивом
+        lengths = nxt - prev + 1
+        window = np.repeat(np.arange(len(prev)), lengths)
+        sample = np.repeat(prev - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        f0, f1 = frames[prev][window], frames[nxt][window]
+        v0, v1 = values[prev][window], values[nxt][window]
+        span = np.where(f1 > f0, f1 - f0, 1.0)
+        fitted = v0 + (v1 - v0) * (frames[sample] - f0) / span
+        error = np.maximum.reduceat(np.abs(values[sample] - fitted), np.cumsum(lengths) - lengths)
+        removable = error <= tolerance
+        if not removable.any():
+            return keep
+        # из подряд идущих кандидатов берём каждый второй, чтобы окна не пересекались
+        run_start = np.maximum.accumulate(np.where(~removable, np.arange(len(removable)), -1))
+        chosen = removable & ((np.arange(len(removable)) - run_start) % 2 == 1)
+        keep[kept[1:-1][chosen]] = False
+
+
+def reduce_keyframes(nodes: List[Dict[str, Any]], tolerances: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Сокращение ключей анимации узлов (на месте).
+
+    Постоянный канал удаляется целиком, а его значение становится статическим значением
+    атрибута узла; у остальных убираются ключи, лежащие на прямой в пределах допуска.
+    """
+    tolerances = {**KEY_TOLERANCES, **(tolerances or {})}
+    report = {'keys_before': 0, 'keys_after': 0, 'channels_dropped': 0}
+    for node in nodes:
+        anim = node.get('animations')
+        if not anim:
+            continue
+        for track in list(anim.keys()):
+            tol = tolerances[track]
+            for ax in list(anim[track].keys()):
+                curve = anim[track][ax]
+                frames = np.asarray(curve['frames'], dtype=np.float64)
+                values = np.asarray(curve['values'], dtype=np.float64)
+                report['keys_before'] += len(frames)
+                if len(values) and np.ptp(values) <= tol:
+                    node[track] = list(node[track])
+                    node[track]['xyz'.index(ax)] = float(values[0])
+                    del anim[track][ax]
+                    report['channels_dropped'] += 1
+                    continue
+                keep = reduce_curve(frames, values, tol)
+                curve['frames'] = frames[keep].tolist()
+                curve['values'] = values[keep].tolist()
+                report['keys_after'] += int(keep.sum())
+            if not anim[track]:
+                del anim[track]
+        node['with_animation'] = bool(anim)
+    return report
+
+
+
+# ------------------------------ сварка вершин ------------------------------
+
+WELD_TOLERANCE = 1e-5  # допуск слияния вершин меша (единицы сцены)
+
+# множители пространственного хэша ячеек (Teschner et al. 2003); коллизии дают
+# лишних кандидатов, которые отсеивает проверка расстояния
+CELL_HASH = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+# своя ячейка и половина из 26 соседних: пара из ячеек c и c + o находится один раз, с любой стороны
+NEIGHBOR_CELLS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)
+                           if (x, y, z) >= (0, 0, 0)], dtype=np.int64)
+
+
+def cell_keys(cells: np.ndarray) -> np.ndarray:
+    h = cells * CELL_HASH
+    return h[..., 0] ^ h[..., 1] ^ h[..., 2]
+
+
+def close_pairs(points: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Все пары (i, j), j < i, с |p_i - p_j| <= tolerance.
+
+    Сетка с шагом 2 * tolerance: такие пары всегда лежат в соседних ячейках (27 ячеек
+    вокруг точки; по симметрии достаточно половины, NEIGHBOR_CELLS). Просматриваются
+    только ячейки, до чьих граней от точки не дальше tolerance (поиск по отсортированным
+    хэшам ячеек).
+    """
+    scaled = points / (2.0 * tolerance)
+    cells = np.floor(scaled).astype(np.int64)
+    frac = scaled - cells
+    near_face = {-1: frac <= 0.5, 0: np.ones_like(frac, dtype=bool), 1: frac >= 0.5}
+    keys = cell_keys(cells)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    pairs_i, pairs_j = [], []
+    for offset in NEIGHBOR_CELLS:
+        asking = np.flatnonzero(near_face[offset[0]][:, 0] & near_face[offset[1]][:, 1] & near_face[offset[2]][:, 2])
+        query = cell_keys(cells[asking] + offset)
+        lo = np.searchsorted(sorted_keys, query, side='left')
+        count = np.searchsorted(sorted_keys, query, side='right') - lo
+        i = np.repeat(asking, count)
+        j = order[np.repeat(lo - np.cumsum(count) + count, count) + np.arange(count.sum())]
+        if offset.any():
+            i, j = np.maximum(i, j), np.minimum(i, j)
+        near = j < i
+        i, j = i[near], j[near]
+        near = np.einsum('ij,ij->i', points[i] - points[j], points[i] - points[j]) <= tolerance * tolerance
+        pairs_i.append(i[near])
+        pairs_j.append(j[near])
+    i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+    # при коллизиях хэша одна пара может найтись дважды
+    i, j = np.unique(np.stack([i, j], axis=1), axis=0).T if len(i) else (i, j)
+    return i, j
+
+
+def weld_vertices(positions: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Слияние позиций, отстоящих не больше чем на tolerance (шов UV / нормалей).
+
+    Точно совпадающие позиции сливаются сразу; остальные пары ищет close_pairs. Точка
+    присоединяется к самой ранней вершине-представителю в пределах tolerance, иначе
+    сама становится представителем: каждая точка не дальше tolerance от своей
+    вершины, цепочек через промежуточные точки нет.
+    Возвращает (позиции, remap): remap[i] — новый индекс строки vbuf i.
+    Новые вершины идут в порядке первого вхождения; tolerance <= 0 — без слияния.
+    """
+    n = len(positions)
+    if tolerance <= 0 or n == 0:
+        return positions, np.arange(n)
+    _, first, exact = np.unique(positions, axis=0, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    exact = rank[exact.reshape(-1)]
+    points = positions[np.sort(first)]
+
+    rep = list(range(len(points)))
+    for i, j in zip(*(a.tolist() for a in close_pairs(points, tolerance))):
+        if rep[i] == i and rep[j] == j:
+            rep[i] = j
+    rep = np.asarray(rep, dtype=np.int64)
+    is_rep = rep == np.arange(len(points))
+    index = np.cumsum(is_rep) - 1
+    return points[is_rep], index[rep][exact]
+
+
+def weld_mesh(vbuf: List[List[float]], ibuf: List[List[int]],
+              tolerance: float) -> Tuple[List[List[float]], List[List[int]], List[List[int]]]:
+    """vrts, ibuf по сваренным вершинам и uv_ibuf — индексы исходных UV (строк vbuf) для mf.
+
+    Треугольники, выродившиеся после слияния, отбрасываются. Треугольник, который после
+    слияния лёг на те же три вершины, что и более ранний (двусторонняя геометрия),
+    остаётся на своих несваренных вершинах — иначе Maya получит lamina faces.
+    """
+    positions = np.array([t[0:3] for t in vbuf], dtype=np.float64).reshape(-1, 3)
+    tris = np.array(ibuf, dtype=np.int64).reshape(-1, 3)
+    welded, remap = weld_vertices(positions, tolerance)
+    faces = remap[tris]
+    valid = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])
+    faces, tris = faces[valid], tris[valid]
+
+    unweld = repeated_sets(faces) & ~repeated_sets(tris)
+    if unweld.any():
+        own = np.unique(tris[unweld])
+        faces[unweld] = len(welded) + np.searchsorted(own, tris[unweld])
+        welded = np.concatenate([welded, positions[own]])
+    return welded.tolist(), faces.tolist(), tris.tolist()
+
+
+def repeated_sets(faces: np.ndarray) -> np.ndarray:
+    """True у треугольников, набор вершин которых уже был у более раннего."""
+    repeated = np.ones(len(faces), dtype=bool)
+    if len(faces):
+        repeated[np.unique(np.sort(faces, axis=1), axis=0, return_index=True)[1]] = False
+    return repeated
+
+
+# ------------------------------ CLI ------------------------------
+
+def pop_option(argv: List[str], flag: str) -> Tuple[Optional[str], List[str]]:
+    """Значение опции `flag VALUE` и argv без неё."""
+    if flag not in argv:
+        return None, argv
+    i = argv.index(flag)
+    value = argv[i + 1] if i + 1 < len(argv) else None
+    return value, argv[:i] + argv[i + 2:]
+
+
+def parse_key_tolerances(value: str) -> Dict[str, float]:
+    """'T' или 'T,R,S' → допуски translation / rotation (градусы) / scaling."""
+    parts = [float(v) for v in value.split(',')]
+    if len(parts) == 1:
+        parts = parts * 3
+    return dict(zip(('translation', 'rotation', 'scaling'), parts))
@@ -6,6 +6,9 @@ import math
 import sys
 from typing import Dict, List, Optional, Tuple, Any
 
+from maya_convert_common import (WELD_TOLERANCE, joint_orients, parse_key_tolerances, pop_option,
+                                  reduce_keyframes, weld_mesh)
+
 FPS = 24.0
 DEG2RAD = math.pi / 180.0
 RAD2DEG = 180.0 / math.pi
@@ -79,8 +82,11 @@ class MeshGeom:
 
 # ------------------------------ Convert nodes --------------------------------
 
-def convert_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def convert_nodes(nodes: List[Dict[str, Any]], weld_tolerance: float = WELD_TOLERANCE) -> List[Dict[str, Any]]:
     result = []
+    # joint orient всех суставов модели одним пакетом
+    joints = [n for n in nodes if n['word'] == 'JOIN']
+    orients = dict(zip((n['index'] for n in joints), joint_orients([n['data'] for n in joints])))
 
     for node in nodes:
         unpacked_node = node['data']
@@ -95,11 +101,13 @@ def convert_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if w in ('ROOT', 'FRAM'):
             result.append(create_fram(unpacked_node, node_name=node_name, parent_node_name=parent_name))
         elif w == 'JOIN':
-            result.append(create_joint(unpacked_node, node_name=node_name, parent_node_name=parent_name))
+            result.append(create_joint(unpacked_node, node_name=node_name, parent_node_name=parent_name,
+                                       joint_orient=orients[node['index']]))
         elif w == 'LOCA':
             result.append(create_locator(unpacked_node, node_name=node_name, parent_node_name=parent_name))
         elif w == 'MESH':
-            result.append(create_mesh(unpacked_node, node_name=node_name, parent_node_name=parent_name))
+            result.append(create_mesh(unpacked_node, node_name=node_name, parent_node_name=parent_name,
+                                      weld_tolerance=weld_tolerance))
 
     return result
 
@@ -144,48 +152,6 @@ def animation_build_tracks_by_axis(raw_values: Dict[str, Any]) -> Dict[str, Dict
     return result
 
 
-def extract_3x3(m4: Optional[List[List[float]]]) -> Optional[List[List[float]]]:
-    if not m4:
-        return None
-    a = [c for row in m4 for c in row]  # flatten row-major 4x4 (length 16)
-    return [
-        [a[0], a[1], a[2]],
-        [a[4], a[5], a[6]],
-        [a[8], a[9], a[10]],
-    ]
-
-
-def matrix_rowmajor_to_euler_xyz_standard(m: Optional[List[List[float]]]) -> List[float]:
-    if m is None:
-        return [0.0, 0.0, 0.0]
-
-    m00, m01, m02 = m[0]
-    m10, m11, m12 = m[1]
-    m20, m21, m22 = m[2]
-
-    # transpose? Ruby re-maps:
-    r00 = m00
-    r01 = m10
-    r02 = m20
-    r10 = m01
-    r11 = m11
-    r12 = m21
-    r20 = m02
-    r21 = m12
-    r22 = m22
-
-    if abs(r20) < 0.999999:
-        y = math.asin(-r20)
-        x = math.atan2(r21, r22)
-        z = math.atan2(r10, r00)
-    else:
-        y = math.asin(-r20)
-        x = math.atan2(-r12, r11)
-        z = 0.0
-
-    return [x * RAD2DEG, y * RAD2DEG, z * RAD2DEG]
-
-
 def build_edges_and_faces_signed(tris: List[List[int]]) -> Tuple[List[List[int]], List[List[int]]]:
     edge_map: Dict[str, int] = {}
     edges: List[List[int]] = []
@@ -244,7 +210,8 @@ def create_fram(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], n
     return result
 
 
-def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], node_name: str = 'transformNode') -> Dict[str, Any]:
+def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], node_name: str = 'transformNode',
+                 joint_orient: Optional[List[float]] = None) -> Dict[str, Any]:
     result: Dict[str, Any] = {}
     result['node_name'] = node_name
     result['parent_node_name'] = parent_node_name
@@ -259,8 +226,9 @@ def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str],
     result['min_rot_limit'] = fram_data['min_rot_limit']      # [rx, ry, rz] (rad)
     result['max_rot_limit'] = fram_data['max_rot_limit']      # [rx, ry, rz] (rad)
 
-    m3 = extract_3x3(result['rotation_matrix'])
-    result['joint_orient'] = matrix_rowmajor_to_euler_xyz_standard(m3)
+    if joint_orient is None:
+        joint_orient = joint_orients([fram_data])[0]
+    result['joint_orient'] = joint_orient
 
     anim = animation_build_tracks_by_axis(fram_data.get('anim', {}))
     result['with_animation'] = bool(anim)
@@ -277,21 +245,21 @@ def create_locator(_: Dict[str, Any], *, node_name: str, parent_node_name: Optio
     }
 
 
-def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name: Optional[str]) -> Dict[str, Any]:
+def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name: Optional[str],
+                weld_tolerance: float = WELD_TOLERANCE) -> Dict[str, Any]:
     result: Dict[str, Any] = {'node_type': 'mesh'}
     result['node_name'] = node_name
     result['parent_node_name'] = parent_node_name
 
-    result['vrts'] = [[t[0], t[1], t[2]] for t in mesh_data['vbuf']]
     ibuf = [[tri[0], tri[1], tri[2]] for tri in mesh_data['ibuf']]
 
     if MeshGeom.mesh_right_handed(ibuf, mesh_data):
         ibuf = [[tri[0], tri[2], tri[1]] for tri in mesh_data['ibuf']]
     else:
         ibuf = [[tri[0], tri[1], tri[2]] for tri in mesh_data['ibuf']]
-    result['ibuf'] = ibuf
+    result['vrts'], result['ibuf'], result['uv_ibuf'] = weld_mesh(mesh_data['vbuf'], ibuf, weld_tolerance)
 
-    edge, face = build_edges_and_faces_signed(ibuf)
+    edge, face = build_edges_and_faces_signed(result['ibuf'])
     result['edge'] = edge
     result['face'] = face
     # Maya expects edges to be triplets; add trailing 0 if only 2 ints provided
@@ -306,8 +274,6 @@ def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name:
         uvpt.append([u, v])
     result['uvpt'] = uvpt
 
-    result['uv_index_of_vertex'] = list(range(len(result['vrts'])))
-
     # Normalize materials and texture fields
     materials_out = []
     for m in mesh_data['materials']:
@@ -460,8 +426,7 @@ def model_to_maya(nodes: List[Dict[str, Any]]) -> str:
             face_lines = []
             for i, edges_triplet in enumerate(node['face']):
                 f_part = f'f 3 {" ".join(map(str, edges_triplet))}'
-                tri = node['ibuf'][i]
-                uv_idx = [node['uv_index_of_vertex'][v] for v in tri]
+                uv_idx = node['uv_ibuf'][i]
                 mf_part = f'mf 3 {" ".join(map(str, uv_idx))}'
                 face_lines.append(f'\t\t{f_part}   {mf_part}')
             out.append(f'\tsetAttr -size {len(node["face"])} ".face[0:{len(node["face"]) - 1}]" -type "polyFaces"\n' +
@@ -508,8 +473,12 @@ def model_to_maya(nodes: List[Dict[str, Any]]) -> str:
 # ------------------------------------ main -----------------------------------
 
 def main(argv: List[str]) -> int:
+    key_tolerance, argv = pop_option(argv, '--reduce-keys')
+    weld, argv = pop_option(argv, '--weld')
     if len(argv) < 3:
-        sys.stderr.write(f"Usage: python {argv[0]} input.json output.ma\n")
+        sys.stderr.write(f"Usage: python {argv[0]} input.json output.ma [--reduce-keys T[,R,S]] [--weld TOLERANCE]\n"
+                         f"  vertices closer than TOLERANCE are welded by default ({WELD_TOLERANCE:g}); "
+                         f"--weld 0 keeps one vertex per vbuf row (output before welding)\n")
         return 1
 
     input_path, output_path = argv[1], argv[2]
@@ -517,7 +486,13 @@ def main(argv: List[str]) -> int:
         nodes = json.load(f)
 
     # вход совпадает с Ruby: массив узлов; символы -> строки уже норм
-    scene = model_to_maya(convert_nodes(nodes))
+    nodes = convert_nodes(nodes, WELD_TOLERANCE if weld is None else float(weld))
+    if key_tolerance:
+        report = reduce_keyframes(nodes, parse_key_tolerances(key_tolerance))
+        print(f"Keyframes: {report['keys_before']} -> {report['keys_after']} "
+              f"({report['keys_before'] - report['keys_after']} removed, "
+              f"{report['channels_dropped']} constant channels dropped)")
+    scene = model_to_maya(nodes)
 
     with open(output_path, 'w', encoding='utf-8') as io:
         io.write(scene)
@@ -3,11 +3,15 @@
 
 import json
 import math
+import os
 import struct
 import sys
 from pprint import pprint
 from typing import Any, Dict, List, Optional, Tuple
 
+from maya_convert_common import (WELD_TOLERANCE, joint_orients, parse_key_tolerances, pop_option,
+                                  reduce_keyframes, weld_mesh)
+
 FPS = 24.0
 DEG2RAD = math.pi / 180.0
 RAD2DEG = 180.0 / math.pi
@@ -308,9 +312,12 @@ class MeshGeom:
         return pos_cnt >= neg_cnt
 
 
-def convert_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def convert_nodes(nodes: List[Dict[str, Any]], weld_tolerance: float = WELD_TOLERANCE) -> List[Dict[str, Any]]:
     """Адаптация под структуру из Nmf(): parent_id/index, word."""
     result = []
+    # joint orient всех суставов модели одним пакетом
+    joints = [n for n in nodes if n["word"] == "JOIN"]
+    orients = dict(zip((n["index"] for n in joints), joint_orients([n["data"] for n in joints])))
     index_map = {n["index"]: n for n in nodes}
     for node in nodes:
         unpacked_node = node["data"]
@@ -324,11 +331,13 @@ def convert_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if w in ("ROOT", "FRAM"):
             result.append(create_fram(unpacked_node, node_name=node_name, parent_node_name=parent_name))
         elif w == "JOIN":
-            result.append(create_joint(unpacked_node, node_name=node_name, parent_node_name=parent_name))
+            result.append(create_joint(unpacked_node, node_name=node_name, parent_node_name=parent_name,
+                                       joint_orient=orients[node["index"]]))
         elif w == "LOCA":
             result.append(create_locator(unpacked_node, node_name=node_name, parent_node_name=parent_name))
         elif w == "MESH":
-            result.append(create_mesh(unpacked_node, node_name=node_name, parent_node_name=parent_name))
+            result.append(create_mesh(unpacked_node, node_name=node_name, parent_node_name=parent_name,
+                                      weld_tolerance=weld_tolerance))
     return result
 
 
@@ -359,35 +368,6 @@ def animation_build_tracks_by_axis(raw_values: Dict[str, Any]) -> Dict[str, Dict
     return result
 
 
-def extract_3x3(m4: Optional[List[List[float]]]) -> Optional[List[List[float]]]:
-    if not m4:
-        return None
-    a = [c for row in m4 for c in row]
-    return [[a[0], a[1], a[2]],
-            [a[4], a[5], a[6]],
-            [a[8], a[9], a[10]]]
-
-
-def matrix_rowmajor_to_euler_xyz_standard(m: Optional[List[List[float]]]) -> List[float]:
-    if m is None:
-        return [0.0, 0.0, 0.0]
-    m00, m01, m02 = m[0]
-    m10, m11, m12 = m[1]
-    m20, m21, m22 = m[2]
-    r00, r01, r02 = m00, m10, m20
-    r10, r11, r12 = m01, m11, m21
-    r20, r21, r22 = m02, m12, m22
-    if abs(r20) < 0.999999:
-        y = math.asin(-r20)
-        x = math.atan2(r21, r22)
-        z = math.atan2(r10, r00)
-    else:
-        y = math.asin(-r20)
-        x = math.atan2(-r12, r11)
-        z = 0.0
-    return [x * RAD2DEG, y * RAD2DEG, z * RAD2DEG]
-
-
 def build_edges_and_faces_signed(tris: List[List[int]]) -> Tuple[List[List[int]], List[List[int]]]:
     edge_map: Dict[str, int] = {}
     edges: List[List[int]] = []
@@ -437,7 +417,8 @@ def create_fram(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], n
     return result
 
 
-def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], node_name: str) -> Dict[str, Any]:
+def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], node_name: str,
+                 joint_orient: Optional[List[float]] = None) -> Dict[str, Any]:
     result: Dict[str, Any] = {}
     result['node_name'] = node_name
     result['parent_node_name'] = parent_node_name
@@ -449,8 +430,9 @@ def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str],
     result['rotation_matrix'] = fram_data['rotation_matrix']
     result['min_rot_limit'] = fram_data['min_rot_limit']
     result['max_rot_limit'] = fram_data['max_rot_limit']
-    m3 = extract_3x3(result['rotation_matrix'])
-    result['joint_orient'] = matrix_rowmajor_to_euler_xyz_standard(m3)
+    if joint_orient is None:
+        joint_orient = joint_orients([fram_data])[0]
+    result['joint_orient'] = joint_orient
     anim = animation_build_tracks_by_axis(fram_data.get('anim', {}))
     result['with_animation'] = bool(anim)
     result['animations'] = anim
@@ -461,20 +443,20 @@ def create_locator(_: Dict[str, Any], *, node_name: str, parent_node_name: Optio
     return {'node_type': 'locator', 'node_name': node_name, 'parent_node_name': parent_node_name}
 
 
-def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name: Optional[str]) -> Dict[str, Any]:
+def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name: Optional[str],
+                weld_tolerance: float = WELD_TOLERANCE) -> Dict[str, Any]:
     result: Dict[str, Any] = {'node_type': 'mesh'}
     result['node_name'] = node_name
     result['parent_node_name'] = parent_node_name
 
-    result['vrts'] = [[t[0], t[1], t[2]] for t in mesh_data['vbuf']]
     ibuf = [[tri[0], tri[1], tri[2]] for tri in mesh_data['ibuf']]
 
     ibuf = [[tri[0], tri[2], tri[1]] for tri in mesh_data['ibuf']] \
         if MeshGeom.mesh_right_handed(ibuf, mesh_data) \
         else [[tri[0], tri[1], tri[2]] for tri in mesh_data['ibuf']]
-    result['ibuf'] = ibuf
+    result['vrts'], result['ibuf'], result['uv_ibuf'] = weld_mesh(mesh_data['vbuf'], ibuf, weld_tolerance)
 
-    edge, face = build_edges_and_faces_signed(ibuf)
+    edge, face = build_edges_and_faces_signed(result['ibuf'])
     result['edge'] = [e + [0] if len(e) == 2 else e for e in edge]
     result['face'] = face
 
@@ -485,8 +467,6 @@ def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name:
     result['uvpt'] = [[float((t[6] if len(t) > 6 else 0.0)),
                        float((t[7] if len(t) > 7 else 0.0))] for t in mesh_data['vbuf']]
 
-    result['uv_index_of_vertex'] = list(range(len(result['vrts'])))
-
     materials_in = mesh_data.get('materials', []) or []
     materials_out = []
     for m in materials_in:
@@ -513,6 +493,10 @@ def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name:
             'place2d_name': f"{mat_name}_place2d",
             'file_name': f"{mat_name}_file",
         })
+        tex = m.get('texture')
+        if isinstance(tex, dict) and 'texture_page' in tex:
+            materials_out[-1]['page_id'] = int(tex['texture_page'])
+            materials_out[-1]['page_rect'] = [tex['x0'], tex['y0'], tex['x2'], tex['y2']]
     if not materials_out:
         # хотя бы один дефолтный материал
         mat_name = f"lambert_{result['node_name']}"
@@ -527,6 +511,101 @@ def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name:
     return result
 
 
+# ---------------- texture page (atlas) binding ----------------
+
+PAGE_IMAGE_EXTS = ('.png', '.dds')
+
+def find_texture_page(pages_dir: str, page_id: int) -> Optional[str]:
+    for ext in PAGE_IMAGE_EXTS:
+        path = os.path.join(pages_dir, f"{page_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def texture_page_size(path: str) -> Tuple[int, int]:
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if head[:4] == b'DDS ':
+        height, width = struct.unpack_from("<2I", head, 12)
+    elif head[:8] == b'\x89PNG\r\n\x1a\n':
+        width, height = struct.unpack_from(">2I", head, 16)
+    else:
+        raise RuntimeError(f"Unsupported texture page image: {path}")
+    return width, height
+
+
+def page_binding(materials: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Материал, по которому меш переносится на страницу целиком, или (None, причина).
+
+    Назначения материалов по граням в NMF нет: UV меша одни на все материалы. Поэтому
+    перепривязка возможна, только если все материалы меша ссылаются на один и тот же
+    прямоугольник одной страницы с одинаковым отражением и без поворота UV.
+    """
+    paged = [m for m in materials if 'page_id' in m]
+    if not paged:
+        return None, None
+    first = paged[0]
+    if len(paged) != len(materials):
+        return None, "has materials without a texture page"
+    layout = (first['page_id'], list(first['page_rect']), first['mirrorU'], first['mirrorV'])
+    if any((m['page_id'], list(m['page_rect']), m['mirrorU'], m['mirrorV']) != layout for m in paged[1:]):
+        return None, "materials use different texture page rectangles"
+    if any(m['rotateUV'] for m in paged):
+        return None, "rotated texture (rotateUV) is not supported"
+    return first, None
+
+
+def apply_atlas_binding(nodes: List[Dict[str, Any]], pages_dir: str) -> Tuple[int, List[Tuple[str, str]]]:
+    """Перепривязка текстур к целым страницам TEXP.
+
+    UV меша переносятся в прямоугольник x0/y0/x2/y2 его материала (page_binding),
+    а материалы меша заменяются одним общим материалом этой страницы.
+    Возвращает (число перепривязанных мешей, [(меш, причина пропуска)]).
+    """
+    pages: Dict[int, Optional[Tuple[str, int, int]]] = {}
+    bound = 0
+    skipped: List[Tuple[str, str]] = []
+    for node in nodes:
+        if node['node_type'] != 'mesh':
+            continue
+        mdef, reason = page_binding(node['materials'])
+        if reason:
+            skipped.append((node['node_name'], reason))
+        if mdef is None:
+            continue
+        page_id = mdef['page_id']
+        if page_id not in pages:
+            path = find_texture_page(pages_dir, page_id)
+            pages[page_id] = (path, *texture_page_size(path)) if path else None
+        page = pages[page_id]
+        if page is None:
+            skipped.append((node['node_name'], f"texture page {page_id} not found"))
+            continue
+        path, width, height = page
+
+        x0, y0, x2, y2 = mdef['page_rect']
+        flip_u, flip_v = mdef['mirrorU'] != 0, mdef['mirrorV'] != 0
+        uvpt = []
+        for u, v in node['uvpt']:
+            if flip_u:
+                u = 1.0 - u
+            if flip_v:
+                v = 1.0 - v
+            uvpt.append([(x0 + u * (x2 - x0)) / width, (y0 + v * (y2 - y0)) / height])
+        node['uvpt'] = uvpt
+        mat_name = f"texture_page_{page_id}"
+        node['materials'] = [{
+            'mat_name': mat_name, 'sg_name': f"{mat_name}SG",
+            'r': 1.0, 'g': 1.0, 'b': 1.0, 'a': 0.0, 't': 0.0,
+            'repeatU': 1, 'repeatV': 1, 'mirrorU': 0, 'mirrorV': 0, 'rotateUV': 0,
+            'tex_path': path.replace('\\', '/'), 'has_tex': True, 'shared': True, 'page_id': page_id,
+            'place2d_name': f"{mat_name}_place2d", 'file_name': f"{mat_name}_file",
+        }]
+        bound += 1
+    return bound, skipped
+
+
 def fmt_f(x: float) -> str:
     s = f"{float(x):.9f}".rstrip('0').rstrip('.')
     return s if s else "0"
@@ -538,6 +617,7 @@ def model_to_maya(nodes: List[Dict[str, Any]]) -> str:
     out.append('requires maya "2.5";')
     out.append('currentUnit -linear centimeter -angle degree -time film;')
 
+    emitted_materials = set()
     for node in nodes:
         nt = node['node_type']
 
@@ -626,8 +706,7 @@ def model_to_maya(nodes: List[Dict[str, Any]]) -> str:
             face_lines = []
             for i, edges_triplet in enumerate(node['face']):
                 f_part = f'f 3 {" ".join(map(str, edges_triplet))}'
-                tri = node['ibuf'][i]
-                uv_idx = [node['uv_index_of_vertex'][v] for v in tri]
+                uv_idx = node['uv_ibuf'][i]
                 mf_part = f'mf 3 {" ".join(map(str, uv_idx))}'
                 face_lines.append(f'\t\t{f_part}   {mf_part}')
             out.append(f'\tsetAttr -size {len(node["face"])} ".face[0:{len(node["face"]) - 1}]" -type "polyFaces"\n' +
@@ -635,6 +714,11 @@ def model_to_maya(nodes: List[Dict[str, Any]]) -> str:
 
             out.append('')
             for material in node['materials']:
+                if material['mat_name'] in emitted_materials:
+                    # общий материал страницы уже создан — только подключаем меш
+                    out.append(f'connectAttr "{node["node_name"]}.instObjGroups" "{material["sg_name"]}.dagSetMembers" -nextAvailable;')
+                    continue
+                emitted_materials.add(material['mat_name'])
                 out.append(f'createNode lambert -name "{material["mat_name"]}";')
                 out.append(f'\tsetAttr ".color" -type "float3" {material["r"]} {material["g"]} {material["b"]} ;')
                 out.append(f'\tsetAttr ".transparency" -type "float3" {material["t"]} {material["t"]} {material["t"]} ;')
@@ -673,8 +757,14 @@ def model_to_maya(nodes: List[Dict[str, Any]]) -> str:
 # ------------------------------------ CLI ------------------------------------
 
 def main(argv: List[str]) -> int:
+    pages_dir, argv = pop_option(argv, '--texture-pages')
+    key_tolerance, argv = pop_option(argv, '--reduce-keys')
+    weld, argv = pop_option(argv, '--weld')
     if len(argv) < 3:
-        sys.stderr.write(f"Usage: python {argv[0]} input.nmf output.ma\n")
+        sys.stderr.write(f"Usage: python {argv[0]} input.nmf output.ma [--texture-pages DIR] "
+                         f"[--reduce-keys T[,R,S]] [--weld TOLERANCE]\n"
+                         f"  vertices closer than TOLERANCE are welded by default ({WELD_TOLERANCE:g}); "
+                         f"--weld 0 keeps one vertex per vbuf row (output before welding)\n")
         return 1
     input_path, output_path = argv[1], argv[2]
 
@@ -683,7 +773,18 @@ def main(argv: List[str]) -> int:
     nodes_raw = parser.unpack(input_path)
 
     # конверсия -> maya
-    scene = model_to_maya(convert_nodes(nodes_raw))
+    nodes = convert_nodes(nodes_raw, WELD_TOLERANCE if weld is None else float(weld))
+    if pages_dir:
+        bound, skipped = apply_atlas_binding(nodes, pages_dir)
+        print(f"Bound {bound} meshes to texture pages from {pages_dir}")
+        for name, reason in skipped:
+            print(f"  {name}: kept its own materials ({reason})")
+    if key_tolerance:
+        report = reduce_keyframes(nodes, parse_key_tolerances(key_tolerance))
+        print(f"Keyframes: {report['keys_before']} -> {report['keys_after']} "
+              f"({report['keys_before'] - report['keys_after']} removed, "
+              f"{report['channels_dropped']} constant channels dropped)")
+    scene = model_to_maya(nodes)
 
     with open(output_path, 'w', encoding='utf-8') as io:
         io.write(scene)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from nmf_transforms import ModelTransforms
+from unpack_nmf import Nmf
+
+FPS = 24.0  # как в конвертерах: ключи ANIM — секунды
+TRACKS = ('translation', 'rotation', 'scaling')
+AXES = ('x', 'y', 'z')
+
+
+class AnimationSampler:
+    """Все кривые ANIM модели в одном наборе массивов (CSR по каналам).
+
+    Канал — (строка узла, компонента 0..8 в порядке translation xyz, rotation xyz,
+    scaling xyz); keys/values каналов лежат подряд, indptr — границы. Значения
+    rotation — радианы, как в файле. Между ключами — линейная интерполяция, вне
+    диапазона — крайнее значение (как np.interp).
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], transforms: Optional[ModelTransforms] = None):
+        self.nodes = nodes
+        self.transforms = transforms or ModelTransforms(nodes)
+        rows, components, keys, values, lengths = [], [], [], [], []
+        for row, node in enumerate(nodes):
+            anim = node['data'].get('anim') or {}
+            for t, track in enumerate(TRACKS):
+                curves = anim.get(track) or {}
+                for a, axis in enumerate(AXES):
+                    k = (curves.get('keys') or {}).get(axis) or []
+                    v = (curves.get('values') or {}).get(axis) or []
+                    count = min(len(k), len(v))
+                    if not count:
+                        continue
+                    rows.append(row)
+                    components.append(t * 3 + a)
+                    keys.append(np.asarray(k[:count], dtype=np.float64))
+                    values.append(np.asarray(v[:count], dtype=np.float64))
+                    lengths.append(count)
+
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.components = np.asarray(components, dtype=np.int64)
+        self.indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        channel = np.repeat(np.arange(len(lengths)), lengths)
+        keys = np.concatenate(keys) if keys else np.empty(0)
+        values = np.concatenate(values) if values else np.empty(0)
+        # ключи внутри канала по возрастанию
+        order = np.lexsort((keys, channel))
+        self.keys, self.values = keys[order], values[order]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def time_range(self) -> Tuple[float, float]:
+        if not self.keys.size:
+            return 0.0, 0.0
+        return float(self.keys.min()), float(self.keys.max())
+
+    def evaluate(self, times: np.ndarray) -> np.ndarray:
+        """Значения всех каналов: (len(times), число каналов)."""
+        times = np.asarray(times, dtype=np.float64).reshape(-1)
+        channels = len(self)
+        if not channels:
+            return np.empty((len(times), 0))
+        # один searchsorted на всё: каналы разнесены по оси времени на span
+        lo, hi = min(self.keys.min(), times.min(initial=0.0)), max(self.keys.max(), times.max(initial=0.0))
+        span = (hi - lo) + 1.0
+        base = np.repeat(np.arange(channels) * span, np.diff(self.indptr))
+        shifted_keys = (self.keys - lo) + base
+        query = (times[None, :] - lo) + (np.arange(channels) * span)[:, None]
+
+        start, end = self.indptr[:-1, None], self.indptr[1:, None]
+        right = np.clip(np.searchsorted(shifted_keys, query, side='right'), start, end - 1)
+        left = np.clip(right - 1, start, end - 1)
+        k0, k1 = self.keys[left], self.keys[right]
+        v0, v1 = self.values[left], self.values[right]
+        dt = k1 - k0
+        w = np.where(dt > 0, (times[None, :] - k0) / np.where(dt > 0, dt, 1.0), 0.0)
+        w = np.clip(w, 0.0, 1.0)
+        # до первого ключа и после последнего — крайние значения
+        out = v0 + (v1 - v0) * w
+        out = np.where(times[None, :] <= self.keys[start], self.values[start], out)
+        out = np.where(times[None, :] >= self.keys[end - 1], self.values[end - 1], out)
+        return out.T
+
+    def sample(self, times: np.ndarray) -> np.ndarray:
+        """TRS всех узлов на каждый момент: (frames, nodes, 9); неанимированное — статика узла."""
+        times = np.asarray(times, dtype=np.float64).reshape(-1)
+        tr = self.transforms
+        static = np.concatenate([tr.translation, tr.rotation, tr.scaling], axis=1)
+        trs = np.repeat(static[None, :, :], len(times), axis=0)
+        trs[:, self.rows, self.components] = self.evaluate(times)
+        return trs
+
+    def world(self, times: np.ndarray, trs: Optional[np.ndarray] = None) -> np.ndarray:
+        """Мировые матрицы (frames, nodes, 4, 4) через иерархию ModelTransforms."""
+        trs = self.sample(times) if trs is None else trs
+        return self.transforms.world(self.transforms.local(trs))
+
+
+def frame_times(start: float, end: float, fps: float = FPS) -> np.ndarray:
+    """Моменты кадров от start до end включительно (секунды)."""
+    count = int(np.floor((end - start) * fps + 1e-9)) + 1
+    return start + np.arange(max(count, 1)) / fps
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Bake NMF animation to per-frame TRS (and world matrices)")
+    parser.add_argument('input', help="source .nmf")
+    parser.add_argument('output', help="output .npz")
+    parser.add_argument('--fps', type=float, default=FPS)
+    parser.add_argument('--start', type=float, help="start time in seconds (default: first key)")
+    parser.add_argument('--end', type=float, help="end time in seconds (default: last key)")
+    parser.add_argument('--world', action='store_true', help="also store world matrices per frame")
+    args = parser.parse_args(argv[1:])
+
+    nodes = Nmf().unpack(args.input)
+    t0 = time.perf_counter()
+    sampler = AnimationSampler(nodes)
+    first, last = sampler.time_range
+    times = frame_times(first if args.start is None else args.start,
+                        last if args.end is None else args.end, args.fps)
+    trs = sampler.sample(times)
+    t_sample = time.perf_counter()
+    arrays = {'times': times, 'trs': trs, 'names': np.array([n['name'] for n in nodes])}
+    if args.world:
+        arrays['world'] = sampler.world(times, trs)
+    t_world = time.perf_counter()
+
+    np.savez_compressed(args.output, **arrays)
+    print(f"{len(sampler)} channels, {len(nodes)} nodes, {len(times)} frames at {args.fps:g} fps: "
+          f"sample {(t_sample - t0) * 1000.0:.1f} ms"
+          + (f", world {(t_world - t_sample) * 1000.0:.1f} ms" if args.world else "")
+          + f" -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
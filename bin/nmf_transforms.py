@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from unpack_nmf import Nmf
+
+# Матрицы — в соглашении Maya и поля matrix в NMF: вектор-строка, p' = p @ M,
+# перенос в последней строке; мир ребёнка = local @ world родителя.
+
+
+def translation_matrices(t: np.ndarray) -> np.ndarray:
+    m = np.zeros(t.shape[:-1] + (4, 4))
+    m[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1.0
+    m[..., 3, 0:3] = t
+    return m
+
+
+def scale_matrices(s: np.ndarray) -> np.ndarray:
+    m = np.zeros(s.shape[:-1] + (4, 4))
+    m[..., [0, 1, 2], [0, 1, 2]] = s
+    m[..., 3, 3] = 1.0
+    return m
+
+
+def shear_matrices(sh: np.ndarray) -> np.ndarray:
+    """Shear Maya (xy, xz, yz): строки [1 0 0], [xy 1 0], [xz yz 1]."""
+    m = translation_matrices(np.zeros(sh.shape))
+    m[..., 1, 0] = sh[..., 0]
+    m[..., 2, 0] = sh[..., 1]
+    m[..., 2, 1] = sh[..., 2]
+    return m
+
+
+def euler_xyz_matrices(angles: np.ndarray) -> np.ndarray:
+    """Углы XYZ (радианы) → вращение Rx @ Ry @ Rz для векторов-строк (порядок Maya xyz)."""
+    cx, cy, cz = np.cos(angles[..., 0]), np.cos(angles[..., 1]), np.cos(angles[..., 2])
+    sx, sy, sz = np.sin(angles[..., 0]), np.sin(angles[..., 1]), np.sin(angles[..., 2])
+    m = np.zeros(angles.shape[:-1] + (4, 4))
+    m[..., 0, 0] = cy * cz
+    m[..., 0, 1] = cy * sz
+    m[..., 0, 2] = -sy
+    m[..., 1, 0] = sx * sy * cz - cx * sz
+    m[..., 1, 1] = sx * sy * sz + cx * cz
+    m[..., 1, 2] = sx * cy
+    m[..., 2, 0] = cx * sy * cz + sx * sz
+    m[..., 2, 1] = cx * sy * sz - sx * cz
+    m[..., 2, 2] = cx * cy
+    m[..., 3, 3] = 1.0
+    return m
+
+
+def chain(*matrices: np.ndarray) -> np.ndarray:
+    out = matrices[0]
+    for m in matrices[1:]:
+        out = out @ m
+    return out
+
+
+class ModelTransforms:
+    """Статические поля трансформаций всех узлов модели NMF (Nmf().unpack) в колонках numpy.
+
+    ROOT/FRAM — стек transform Maya:
+        [Sp]^-1 [S] [Sh] [Sp] [St] [Rp]^-1 [R] [Rp] [Rt] [T]
+    JOIN — стек joint: [S] [R] [JO] [T], JO — rotation_matrix узла.
+    LOCA и MESH своей трансформации не имеют (единичная матрица).
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]]):
+        self.nodes = nodes
+        n = len(nodes)
+        row_of = {node['index']: row for row, node in enumerate(nodes)}
+        self.parent = np.array([row_of.get(node['parent_id'], -1) for node in nodes], dtype=np.int64)
+        self.depth = self._depths()
+
+        def column(key: str, default) -> np.ndarray:
+            return np.array([node['data'].get(key, default) for node in nodes], dtype=np.float64).reshape(n, 3)
+
+        self.translation = column('translation', [0.0, 0.0, 0.0])
+        self.rotation = column('rotation', [0.0, 0.0, 0.0])
+        self.scaling = column('scaling', [1.0, 1.0, 1.0])
+        self.rotate_pivot = column('rotate_pivot', [0.0, 0.0, 0.0])
+        self.rotate_pivot_translate = column('rotate_pivot_translate', [0.0, 0.0, 0.0])
+        self.scale_pivot = column('scale_pivot', [0.0, 0.0, 0.0])
+        self.scale_pivot_translate = column('scale_pivot_translate', [0.0, 0.0, 0.0])
+        self.shear = column('shear', [0.0, 0.0, 0.0])
+
+        words = [node['word'] for node in nodes]
+        self.is_joint = np.array([w == 'JOIN' for w in words], dtype=bool)
+        self.has_transform = np.array([w in ('ROOT', 'FRAM', 'JOIN') for w in words], dtype=bool)
+        self.joint_orient = translation_matrices(np.zeros((n, 3)))
+        for row in np.flatnonzero(self.is_joint):
+            m = nodes[row]['data'].get('rotation_matrix')
+            if m:
+                self.joint_orient[row, 0:3, 0:3] = np.asarray(m, dtype=np.float64)[0:3, 0:3]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _depths(self) -> np.ndarray:
+        depth = np.zeros(len(self.parent), dtype=np.int64)
+        has_parent = self.parent >= 0
+        for _ in range(len(self.parent) + 1):
+            updated = np.where(has_parent, depth[self.parent] + 1, 0)
+            if np.array_equal(updated, depth):
+                return depth
+            depth = updated
+        raise RuntimeError("Cycle in NMF node hierarchy")
+
+    def local(self, trs: Optional[np.ndarray] = None) -> np.ndarray:
+        """Локальные матрицы (..., n, 4, 4).
+
+        trs (..., n, 9) — translation, rotation (радианы), scaling на кадр; по умолчанию
+        статические значения узлов. Пивоты, shear и joint orient берутся из узлов.
+        """
+        if trs is None:
+            t, r, s = self.translation, self.rotation, self.scaling
+        else:
+            t, r, s = trs[..., 0:3], trs[..., 3:6], trs[..., 6:9]
+        shape = np.broadcast_shapes(t.shape, r.shape, s.shape)
+        t, r, s = (np.broadcast_to(a, shape) for a in (t, r, s))
+
+        rot = euler_xyz_matrices(r)
+        sp, rp = self.scale_pivot, self.rotate_pivot
+        transform = chain(translation_matrices(-sp), scale_matrices(s), shear_matrices(self.shear),
+                          translation_matrices(sp + self.scale_pivot_translate - rp), rot,
+                          translation_matrices(rp + self.rotate_pivot_translate + t))
+        joint = chain(scale_matrices(s), rot, self.joint_orient, translation_matrices(t))
+
+        identity = translation_matrices(np.zeros(shape))
+        return np.where(self.is_joint[:, None, None], joint,
+                        np.where(self.has_transform[:, None, None], transform, identity))
+
+    def world(self, local: Optional[np.ndarray] = None) -> np.ndarray:
+        """Мировые матрицы (..., n, 4, 4): по уровням глубины, одним matmul на уровень."""
+        local = self.local() if local is None else local
+        world = local.copy()
+        for level in range(1, int(self.depth.max(initial=0)) + 1):
+            rows = np.flatnonzero(self.depth == level)
+            world[..., rows, :, :] = local[..., rows, :, :] @ world[..., self.parent[rows], :, :]
+        return world
+
+    def stored_local(self) -> np.ndarray:
+        """Поле matrix из файла (там, где оно есть) — для сверки с local()."""
+        out = translation_matrices(np.zeros((len(self), 3)))
+        for row, node in enumerate(self.nodes):
+            m = node['data'].get('matrix')
+            if m:
+                out[row] = np.asarray(m, dtype=np.float64)
+        return out
+
+
+def transform_points(points: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    return points @ matrix[..., 0:3, 0:3] + matrix[..., 3, 0:3]
+
+
+def mesh_world_bounds(transforms: ModelTransforms, world: np.ndarray) -> Dict[str, np.ndarray]:
+    """AABB вершин каждого MESH в мировых координатах: имя → [[min], [max]]."""
+    out = {}
+    for row, node in enumerate(transforms.nodes):
+        if node['word'] != 'MESH' or not node['data'].get('vbuf'):
+            continue
+        vbuf = np.asarray(node['data']['vbuf'], dtype=np.float64).reshape(-1, 10)
+        points = transform_points(vbuf[:, 0:3], world[row])
+        out[node['name']] = np.stack([points.min(axis=0), points.max(axis=0)])
+    return out
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="World-space transforms and bounds of an NMF model")
+    parser.add_argument('input', help="source .nmf")
+    parser.add_argument('--json', help="write local/world matrices and bounds to this file")
+    args = parser.parse_args(argv[1:])
+
+    nodes = Nmf().unpack(args.input)
+    t0 = time.perf_counter()
+    transforms = ModelTransforms(nodes)
+    local = transforms.local()
+    world = transforms.world(local)
+    bounds = mesh_world_bounds(transforms, world)
+    elapsed = time.perf_counter() - t0
+
+    rows = np.flatnonzero(transforms.has_transform)
+    deviation = np.abs(local[rows] - transforms.stored_local()[rows]).max(initial=0.0)
+    for row, node in enumerate(nodes):
+        x, y, z = world[row, 3, 0:3]
+        print(f"{node['index']:>4} {node['word']} {node['name']:<24} world ({x:.4f}, {y:.4f}, {z:.4f})")
+    for name, (lo, hi) in bounds.items():
+        print(f"  bounds {name}: {np.round(lo, 4).tolist()} .. {np.round(hi, 4).tolist()}")
+    if bounds:
+        all_bounds = np.stack(list(bounds.values()))
+        print(f"model bounds: {np.round(all_bounds[:, 0].min(axis=0), 4).tolist()} .. "
+              f"{np.round(all_bounds[:, 1].max(axis=0), 4).tolist()}")
+    print(f"{len(nodes)} nodes in {elapsed * 1000.0:.2f} ms; max |local - stored matrix| = {deviation:.2e}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as io:
+            json.dump({'nodes': [{'name': node['name'], 'local': local[row].tolist(), 'world': world[row].tolist()}
+                                 for row, node in enumerate(nodes)],
+                       'bounds': {name: b.tolist() for name, b in bounds.items()}}, io, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from unpack_nmf import Nmf
+
+CACHE_SIZE = 16  # FIFO post-transform кэш, под который оптимизируем и считаем ACMR
+
+
+def acmr(tris: np.ndarray, cache_size: int = CACHE_SIZE) -> float:
+    """Average cache miss ratio: промахи FIFO-кэша вершин на треугольник."""
+    if not len(tris):
+        return 0.0
+    fifo: deque = deque()
+    cached = set()
+    misses = 0
+    for v in tris.reshape(-1).tolist():
+        if v in cached:
+            continue
+        misses += 1
+        fifo.append(v)
+        cached.add(v)
+        if len(fifo) > cache_size:
+            cached.discard(fifo.popleft())
+    return misses / len(tris)
+
+
+def vertex_triangles(tris: np.ndarray, vnum: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR вершина → треугольники: (indptr, индексы треугольников)."""
+    flat = tris.reshape(-1)
+    order = np.argsort(flat, kind='stable')
+    indptr = np.zeros(vnum + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=vnum), out=indptr[1:])
+    return indptr, order // 3
+
+
+def tipsify(tris: np.ndarray, vnum: int, cache_size: int = CACHE_SIZE) -> Tuple[np.ndarray, List[int]]:
+    """Порядок треугольников по Tipsify (Sander, Nehab, Barczak 2007).
+
+    Возвращает (порядок, начала кластеров): кластер начинается там, где веер
+    продолжается с вершины, уже вытесненной из кэша, — дальше по этим границам
+    кластеры переставляются против overdraw, не ломая локальность внутри них.
+    """
+    indptr, adjacency = vertex_triangles(tris, vnum)
+    adjacency = adjacency.tolist()
+    indptr = indptr.tolist()
+    corners = tris.tolist()
+    live = np.diff(np.asarray(indptr)).tolist()
+    stamp = [0] * vnum
+    emitted = [False] * len(corners)
+    dead_end: List[int] = []
+    out: List[int] = []
+    clusters: List[int] = []
+
+    fanning = int(tris[0, 0]) if len(corners) else -1
+    time_stamp = cache_size + 1
+    cursor = 0
+    while fanning >= 0:
+        if time_stamp - stamp[fanning] > cache_size:
+            clusters.append(len(out))
+        candidates = []
+        for t in adjacency[indptr[fanning]:indptr[fanning + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            out.append(t)
+            for v in corners[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time_stamp - stamp[v] > cache_size:
+                    stamp[v] = time_stamp
+                    time_stamp += 1
+
+        # следующая вершина веера: из только что задетых, ещё живая и с запасом в кэше
+        fanning, best = -1, -1
+        for v in candidates:
+            if live[v] <= 0:
+                continue
+            priority = 0
+            if time_stamp - stamp[v] + 2 * live[v] <= cache_size:
+                priority = time_stamp - stamp[v]
+            if priority > best:
+                fanning, best = v, priority
+        if fanning >= 0:
+            continue
+        while dead_end:
+            v = dead_end.pop()
+            if live[v] > 0:
+                fanning = v
+                break
+        else:
+            while cursor < vnum and live[cursor] <= 0:
+                cursor += 1
+            fanning = cursor if cursor < vnum else -1
+    return np.asarray(out, dtype=np.int64), clusters
+
+
+def sort_clusters_for_overdraw(tris: np.ndarray, positions: np.ndarray, order: np.ndarray,
+                               clusters: List[int]) -> np.ndarray:
+    """Кластеры, обращённые наружу от центра меша, — вперёд (как в Tipsify, без soft-границ).
+
+    Метрика — (центр кластера - центр меша) · нормаль кластера.
+    """
+    if len(clusters) <= 1:
+        return order
+    p = positions[tris[order]]
+    area_normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    area = np.linalg.norm(area_normals, axis=1)
+    centers = p.mean(axis=1)
+    mesh_center = (centers * area[:, None]).sum(axis=0) / max(area.sum(), 1e-12)
+
+    starts = np.asarray(clusters, dtype=np.int64)
+    normal = np.add.reduceat(area_normals, starts)
+    weight = np.add.reduceat(area, starts)
+    center = np.add.reduceat(centers * area[:, None], starts) / np.maximum(weight, 1e-12)[:, None]
+    normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-12)[:, None]
+    score = np.einsum('ij,ij->i', center - mesh_center, normal)
+
+    ends = np.append(starts[1:], len(order))
+    ranked = np.argsort(-score, kind='stable')
+    return np.concatenate([order[starts[c]:ends[c]] for c in ranked])
+
+
+def fetch_order(tris: np.ndarray, vnum: int) -> np.ndarray:
+    """Вершины в порядке первого обращения из ibuf; не используемые — в конце."""
+    flat = tris.reshape(-1)
+    first = np.full(vnum, len(flat), dtype=np.int64)
+    np.minimum.at(first, flat, np.arange(len(flat)))
+    return np.argsort(first, kind='stable')
+
+
+def optimize_mesh(data: Dict[str, Any], cache_size: int = CACHE_SIZE, overdraw: bool = True) -> Dict[str, float]:
+    """Перестановка ibuf и vbuf/uvpt данных MESH на месте (меш без unknown_ints и mesh_anim)."""
+    vbuf = np.asarray(data['vbuf'], dtype=np.float32).reshape(-1, 10)
+    uvpt = np.asarray(data['uvpt'], dtype=np.float32).reshape(-1, 2)
+    tris = np.asarray(data['ibuf'], dtype=np.int64).reshape(-1, 3)
+    vnum = len(vbuf)
+    before = acmr(tris, cache_size)
+
+    order, clusters = tipsify(tris, vnum, cache_size)
+    if overdraw:
+        order = sort_clusters_for_overdraw(tris, vbuf[:, 0:3].astype(np.float64), order, clusters)
+    tris = tris[order]
+
+    vorder = fetch_order(tris, vnum)
+    remap = np.empty(vnum, dtype=np.int64)
+    remap[vorder] = np.arange(vnum)
+    data['vbuf'] = vbuf[vorder]
+    data['uvpt'] = uvpt[vorder]
+    data['ibuf'] = remap[tris]
+    return {'triangles': len(tris), 'vertices': vnum, 'clusters': len(clusters),
+            'acmr_before': before, 'acmr_after': acmr(data['ibuf'], cache_size)}
+
+
+def optimize_nodes(nodes: List[Dict[str, Any]], cache_size: int = CACHE_SIZE,
+                   overdraw: bool = True) -> List[Tuple[str, Dict[str, float]]]:
+    report = []
+    for node in nodes:
+        if node['word'] != 'MESH':
+            continue
+        data = node['data']
+        if data.get('unknown_ints'):
+            # неизвестная разметка поверх ibuf (стрипы / сабмеши?) — не трогаем
+            report.append((node['name'], {'skipped': 'unknown_ints'}))
+            continue
+        if data.get('mesh_anim'):
+            # unknown_ints кадров — индексы вершин лишь по догадке, перенумеровать их нельзя
+            report.append((node['name'], {'skipped': 'mesh_anim'}))
+            continue
+        if not data.get('ibuf'):
+            continue
+        report.append((node['name'], optimize_mesh(data, cache_size, overdraw)))
+    return report
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Reorder NMF mesh triangles and vertices for the vertex cache")
+    parser.add_argument('input', help="source .nmf")
+    parser.add_argument('output', help="optimized .nmf")
+    parser.add_argument('--cache', type=int, default=CACHE_SIZE, help="FIFO vertex cache size")
+    parser.add_argument('--no-overdraw', action='store_true', help="keep Tipsify order, skip cluster sorting")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    nmf = Nmf()
+    nodes = nmf.unpack(args.input)
+    report = optimize_nodes(nodes, args.cache, not args.no_overdraw)
+    nmf.pack_file(nodes, args.output)
+    elapsed = time.perf_counter() - t0
+
+    total = {'triangles': 0, 'before': 0.0, 'after': 0.0}
+    for name, stats in report:
+        if 'skipped' in stats:
+            print(f"  {name}: skipped (mesh has {stats['skipped']})")
+            continue
+        print(f"  {name}: {stats['triangles']} tris, {stats['vertices']} verts, "
+              f"ACMR {stats['acmr_before']:.3f} -> {stats['acmr_after']:.3f}")
+        total['triangles'] += stats['triangles']
+        total['before'] += stats['acmr_before'] * stats['triangles']
+        total['after'] += stats['acmr_after'] * stats['triangles']
+    if total['triangles']:
+        print(f"ACMR (cache {args.cache}): {total['before'] / total['triangles']:.3f} -> "
+              f"{total['after'] / total['triangles']:.3f} over {total['triangles']} triangles")
+    print(f"Wrote {args.output} in {elapsed * 1000.0:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
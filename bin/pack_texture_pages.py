@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from extract_textures import MANIFEST_NAME
+from texture_codec import decode_pixels, encode_pixels, read_dds, read_png, write_dds, x_bits
+
+MAX_PAGE_SIZE = 512  # ограничение движка на размер страницы
+
+
+# ------------------------------ MaxRects ------------------------------
+
+class MaxRectsPage:
+    """Одна страница: список свободных прямоугольников (x, y, w, h), эвристика Bottom-Left.
+
+    Bottom-Left держит занятую область компактной, и последняя страница ужимается fitted_size().
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free: List[Tuple[int, int, int, int]] = [(0, 0, width, height)]
+        self.used_area = 0
+
+    def find(self, w: int, h: int, allow_rotate: bool) -> Optional[Tuple[int, int, int, int, bool]]:
+        best = None
+        best_score = (sys.maxsize, sys.maxsize)
+        for fx, fy, fw, fh in self.free:
+            for rw, rh, rotated in ((w, h, False), (h, w, True)) if allow_rotate and w != h else ((w, h, False),):
+                if rw <= fw and rh <= fh and (fy + rh, fx) < best_score:
+                    best_score = (fy + rh, fx)
+                    best = (fx, fy, rw, rh, rotated)
+        return best
+
+    def place(self, x: int, y: int, w: int, h: int):
+        new_free = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                new_free.append((fx, fy, fw, fh))
+                continue
+            # разрезаем пересечённый свободный прямоугольник на до четырёх частей
+            if x > fx:
+                new_free.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                new_free.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                new_free.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                new_free.append((fx, y + h, fw, fy + fh - y - h))
+        self.free = prune_contained(new_free)
+        self.used_area += w * h
+
+
+def prune_contained(rects: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    rects = sorted(set(rects), key=lambda r: r[2] * r[3], reverse=True)
+    kept: List[Tuple[int, int, int, int]] = []
+    for r in rects:
+        x, y, w, h = r
+        if not any(kx <= x and ky <= y and x + w <= kx + kw and y + h <= ky + kh for kx, ky, kw, kh in kept):
+            kept.append(r)
+    return kept
+
+
+def pack_rects(sizes: List[Tuple[int, int]], page_size: int = MAX_PAGE_SIZE,
+               allow_rotate: bool = False) -> List[Tuple[int, int, int, bool]]:
+    """Раскладка прямоугольников по страницам. Возвращает (page, x, y, rotated) в порядке sizes."""
+    order = sorted(range(len(sizes)), key=lambda i: (max(sizes[i]), min(sizes[i])), reverse=True)
+    pages: List[MaxRectsPage] = []
+    placement: List[Optional[Tuple[int, int, int, bool]]] = [None] * len(sizes)
+    for i in order:
+        w, h = sizes[i]
+        if max(w, h) > page_size:
+            raise RuntimeError(f"Texture {w}x{h} does not fit into a {page_size}x{page_size} page")
+        for page_index, page in enumerate(pages):
+            fit = page.find(w, h, allow_rotate)
+            if fit:
+                break
+        else:
+            pages.append(MaxRectsPage(page_size, page_size))
+            page_index, page = len(pages) - 1, pages[-1]
+            fit = page.find(w, h, allow_rotate)
+        x, y, rw, rh, rotated = fit
+        page.place(x, y, rw, rh)
+        placement[i] = (page_index, x, y, rotated)
+    return placement
+
+
+def shelf_page_count(sizes: List[Tuple[int, int]], page_size: int = MAX_PAGE_SIZE) -> int:
+    """Наивная раскладка полками в исходном порядке — для сравнения."""
+    pages, x, y, shelf = 1, 0, 0, 0
+    for w, h in sizes:
+        if x + w > page_size:
+            x, y, shelf = 0, y + shelf, 0
+        if y + h > page_size:
+            pages, x, y, shelf = pages + 1, 0, 0, 0
+        x += w
+        shelf = max(shelf, h)
+    return pages if sizes else 0
+
+
+def fitted_size(rects: List[Tuple[int, int, int, int]], page_size: int) -> int:
+    """Сторона наименьшей квадратной страницы (степень двойки), вмещающей занятые прямоугольники.
+
+    Страница только квадратная: pack.rb масштабирует прямоугольники как dds_height / json_width.
+    """
+    right = max(x + w for x, y, w, h in rects)
+    bottom = max(y + h for x, y, w, h in rects)
+    side = 1 << max(0, (max(right, bottom) - 1).bit_length())
+    return min(side, page_size)
+
+
+# ------------------------------ входные изображения ------------------------------
+
+def load_image(path: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """RGBA и бит 15 пикселей непрозрачного .dds (иначе None), см. texture_codec.x_bits."""
+    if path.lower().endswith('.dds'):
+        pixels, width, height, is_alpha = read_dds(path)
+        return decode_pixels(pixels, width, height, is_alpha), None if is_alpha else x_bits(pixels, width, height)
+    return read_png(path), None
+
+
+def load_manifest_textures(source_dir: str) -> List[Dict[str, Any]]:
+    """Текстуры из манифеста extract_textures.py: одно изображение на каждый output,
+    со списком ссылок (старые page id / индекс на странице)."""
+    with open(os.path.join(source_dir, MANIFEST_NAME), 'r', encoding='utf-8') as io:
+        manifest = json.load(io)
+    by_output: Dict[str, Dict[str, Any]] = {}
+    for page in manifest:
+        for index, tex in enumerate(page['textures']):
+            if not tex['output']:
+                continue  # пустой / выходящий за страницу box: extract_textures его не писал
+            key = tex['output'].lower()
+            entry = by_output.get(key)
+            if entry is None:
+                entry = by_output[key] = {
+                    'filepath': tex['filepath'], 'source_box': tex['source_box'],
+                    'path': os.path.join(source_dir, tex['output']),
+                    'is_alpha': page['is_alpha'], 'refs': [],
+                }
+            entry['is_alpha'] = entry['is_alpha'] or page['is_alpha']
+            entry['refs'].append({'page': page['id'], 'index': index})
+    return list(by_output.values())
+
+
+# ------------------------------ сборка страниц ------------------------------
+
+def build_pages(textures: List[Dict[str, Any]], first_id: int, page_size: int,
+                allow_rotate: bool) -> Tuple[List[Dict[str, Any]], List[Tuple[np.ndarray, np.ndarray]]]:
+    """Страницы одного типа прозрачности: описания (формат texture_pages.json) и пиксели —
+    (RGBA, бит 15 для непрозрачных страниц; 1 там, где исходного бита нет)."""
+    sizes = [(t['rgba'].shape[1], t['rgba'].shape[0]) for t in textures]
+    placement = pack_rects(sizes, page_size, allow_rotate)
+    count = max((p[0] for p in placement), default=-1) + 1
+
+    pages, images = [], []
+    for page_index in range(count):
+        members = [i for i, p in enumerate(placement) if p[0] == page_index]
+        rects = []
+        for i in members:
+            _, x, y, rotated = placement[i]
+            w, h = sizes[i][::-1] if rotated else sizes[i]
+            rects.append((x, y, w, h))
+        width = height = fitted_size(rects, page_size)
+        rgba = np.zeros((height, width, 4), dtype=np.uint8)
+        x_bit = np.ones((height, width), dtype=bool)
+        page = {'width': width, 'height': height, 'id': first_id + page_index,
+                'textures': [], 'is_alpha': textures[0]['is_alpha']}
+        for i, (x, y, w, h) in zip(members, rects):
+            tex = textures[i]
+            src = np.rot90(tex['rgba']) if placement[i][3] else tex['rgba']
+            rgba[y:y + h, x:x + w] = src
+            if tex.get('x_bit') is not None:
+                x_bit[y:y + h, x:x + w] = np.rot90(tex['x_bit']) if placement[i][3] else tex['x_bit']
+            tex['placed'] = {'page': page['id'], 'index': len(page['textures']),
+                             'x0': x, 'y0': y, 'x2': x + w, 'y2': y + h, 'rotated': placement[i][3]}
+            page['textures'].append({'filepath': tex['filepath'],
+                                     'box': {'x0': x, 'y0': y, 'x2': x + w, 'y2': y + h},
+                                     'source_box': tex['source_box']})
+        pages.append(page)
+        images.append((rgba, x_bit))
+    return pages, images
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Pack extracted textures into TEXP pages (MaxRects)")
+    parser.add_argument('source', help=f"directory written by extract_textures.py (with {MANIFEST_NAME})")
+    parser.add_argument('output', help="unpack 'pack' directory: writes texture_pages.json and texture_pages/<id>.dds")
+    parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE)
+    parser.add_argument('--rotate', action='store_true',
+                        help="allow 90° rotation (rotated entries need their UVs rotated too)")
+    args = parser.parse_args(argv[1:])
+    page_size = min(args.page_size, MAX_PAGE_SIZE)
+
+    t0 = time.perf_counter()
+    textures = load_manifest_textures(args.source)
+    for tex in textures:
+        tex['rgba'], tex['x_bit'] = load_image(tex['path'])
+    t_load = time.perf_counter()
+
+    pages: List[Dict[str, Any]] = []
+    images: List[Tuple[np.ndarray, np.ndarray]] = []
+    # прозрачность — свойство страницы целиком, поэтому группы пакуются отдельно
+    for is_alpha in (False, True):
+        group = [t for t in textures if t['is_alpha'] == is_alpha]
+        if group:
+            group_pages, group_images = build_pages(group, len(pages) + 1, page_size, args.rotate)
+            pages += group_pages
+            images += group_images
+    t_pack = time.perf_counter()
+
+    pages_dir = os.path.join(args.output, 'texture_pages')
+    os.makedirs(pages_dir, exist_ok=True)
+    for page, (rgba, x_bit) in zip(pages, images):
+        write_dds(os.path.join(pages_dir, f"{page['id']}.dds"), encode_pixels(rgba, page['is_alpha'], x_bit),
+                  page['width'], page['height'], page['is_alpha'])
+    with open(os.path.join(args.output, 'texture_pages.json'), 'w', encoding='utf-8') as io:
+        json.dump(pages, io, ensure_ascii=False, indent=2)
+
+    # старые (page, index) → новые координаты для TXPG в материалах моделей
+    remap = [{'filepath': t['filepath'], 'old_page': ref['page'], 'old_index': ref['index'], **t['placed']}
+             for t in textures for ref in t['refs']]
+    with open(os.path.join(args.output, 'texture_pages_remap.json'), 'w', encoding='utf-8') as io:
+        json.dump(remap, io, ensure_ascii=False, indent=2)
+
+    naive = sum(shelf_page_count([(t['rgba'].shape[1], t['rgba'].shape[0]) for t in textures if t['is_alpha'] == a],
+                                 page_size) for a in (False, True))
+    rotated = sum(1 for t in textures if t['placed']['rotated'])
+    print(f"Packed {len(textures)} textures into {len(pages)} pages (naive shelf packing: {naive})")
+    print(f"load {(t_load - t0) * 1000.0:.0f} ms, pack {(t_pack - t_load) * 1000.0:.0f} ms, "
+          f"write {(time.perf_counter() - t_pack) * 1000.0:.0f} ms")
+    if rotated:
+        print(f"Warning: {rotated} textures were rotated; TXPG rectangles carry no rotation, remap their UVs")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
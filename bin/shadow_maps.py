@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from texture_codec import write_png
+from wld_index import WldIndex
+from wld_models import WldFile
+from wld_tree import read_tree, shadow_words
+
+NIBBLES_PER_SAMPLE = 4  # SHAD хранит 2 байта на ячейку size1 × size2
+
+
+def decode_shadow(blob, size1: int, size2: int) -> np.ndarray:
+    """Байты SHAD → uint8 массив (size1, size2, 4) значений 0..15.
+
+    Ruby читает блок как (size1 * size2 / 2 [+ 1]) float — то есть 16 бит на ячейку.
+    Каждый байт раскладывается на младший и старший полубайт, младший первым.
+    """
+    raw = np.frombuffer(blob, dtype=np.uint8)
+    nibbles = np.empty(raw.size * 2, dtype=np.uint8)
+    nibbles[0::2] = raw & 0x0F
+    nibbles[1::2] = raw >> 4
+    count = size1 * size2 * NIBBLES_PER_SAMPLE
+    return nibbles[:count].reshape(size1, size2, NIBBLES_PER_SAMPLE)
+
+
+def encode_shadow(samples: np.ndarray) -> bytes:
+    """Обратное decode_shadow: (size1, size2, 4) → байты SHAD с выравниванием до слова."""
+    size1, size2 = samples.shape[:2]
+    nibbles = np.zeros(shadow_words(size1, size2) * 8, dtype=np.uint8)
+    flat = samples.reshape(-1).astype(np.uint8)
+    if flat.max(initial=0) > 0x0F:
+        raise ValueError("Shadow samples must be in 0..15")
+    nibbles[:flat.size] = flat
+    return (nibbles[0::2] | (nibbles[1::2] << 4)).tobytes()
+
+
+def shadow_image(samples: np.ndarray) -> np.ndarray:
+    """Четыре полубайта ячейки → RGBA каналы (x17, чтобы 15 стало 255)."""
+    return (samples * 17).astype(np.uint8)
+
+
+def read_shadows(world: WldFile) -> Dict[int, np.ndarray]:
+    shadows = {}
+    for node in read_tree(world):
+        shad = node.get('shad')
+        if shad:
+            blob = world.view[shad['offset']:shad['offset'] + shad['length']]
+            shadows[node['index']] = decode_shadow(blob, shad['size1'], shad['size2']).copy()
+            blob.release()
+    return shadows
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Dump SHAD shadow maps of WLD world models")
+    parser.add_argument('world', help="path to the .wld file")
+    parser.add_argument('output', help="output .npz file or directory for PNG images")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    with WldFile(args.world, WldIndex.open(args.world)) as world:
+        shadows = read_shadows(world)
+    t_decode = time.perf_counter()
+
+    if args.output.lower().endswith('.npz'):
+        # ключ — id узла TREE, как index в shadows.bin
+        np.savez_compressed(args.output, **{str(index): samples for index, samples in shadows.items()})
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        for index, samples in shadows.items():
+            write_png(os.path.join(args.output, f"{index}.png"), shadow_image(samples))
+    print(f"{len(shadows)} shadow maps: decode {(t_decode - t0) * 1000.0:.1f} ms, "
+          f"write {(time.perf_counter() - t_decode) * 1000.0:.1f} ms -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wld_index import WldIndex, read_cstring
+from wld_models import WldFile, aligned_name_end
+
+# DDS: 16-битный A1R5G5B5 без сжатия (см. lib/file_savers/dds_file_saver.rb)
+DDS_MAGIC = 0x20534444
+DDS_HEADER_SIZE = 128
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+# ------------------------------ TEXP / PAGE ------------------------------
+
+def parse_page(data, offset: int) -> Dict[str, Any]:
+    """Заголовок PAGE (payload с offset): размеры, список текстур и смещение пикселей."""
+    _two, width, height, page_id, texture_count = struct.unpack_from("<5i", data, offset)
+    pos = offset + 20
+    textures = []
+    for _ in range(texture_count):
+        filepath = read_cstring(data, pos)
+        pos = aligned_name_end(data, pos)
+        box = struct.unpack_from("<4i", data, pos)
+        source_box = struct.unpack_from("<4i", data, pos + 16)
+        pos += 32
+        textures.append({
+            'filepath': filepath,
+            'box': dict(zip(('x0', 'y0', 'x2', 'y2'), box)),
+            'source_box': dict(zip(('x0', 'y0', 'x2', 'y2'), source_box)),
+        })
+    token = bytes(data[pos:pos + 4])
+    if token != b'TXPG':
+        raise RuntimeError(f"Not found TXPG separator (got '{token!r}')")
+    is_alpha = struct.unpack_from("<i", data, pos + 4)[0] == -1
+    pos += 8
+    return {
+        'id': page_id, 'width': width, 'height': height, 'textures': textures,
+        'is_alpha': is_alpha, 'pixels_offset': pos, 'pixels_length': width * height * 2,
+    }
+
+
+# ------------------------------ codec ------------------------------
+
+def expand5(v: np.ndarray) -> np.ndarray:
+    return ((v << 3) | (v >> 2)).astype(np.uint8)
+
+
+def decode_pixels(pixels, width: int, height: int, is_alpha: bool) -> np.ndarray:
+    """A1R5G5B5 / X1R5G5B5 → RGBA uint8 массив (height, width, 4)."""
+    px = np.frombuffer(pixels, dtype='<u2', count=width * height).reshape(height, width)
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[..., 0] = expand5((px >> 10) & 0x1F)
+    rgba[..., 1] = expand5((px >> 5) & 0x1F)
+    rgba[..., 2] = expand5(px & 0x1F)
+    if is_alpha:
+        rgba[..., 3] = np.where(px & 0x8000, 255, 0).astype(np.uint8)
+    else:
+        rgba[..., 3] = 255
+    return rgba
+
+
+def x_bits(pixels, width: int, height: int) -> np.ndarray:
+    """Бит 15 каждого пикселя (height, width): у непрозрачных страниц (X1R5G5B5) в RGBA
+    не попадает, его передают в encode_pixels, чтобы пиксели записались байт в байт."""
+    px = np.frombuffer(pixels, dtype='<u2', count=width * height).reshape(height, width)
+    return (px & 0x8000) != 0
+
+
+def encode_pixels(rgba: np.ndarray, is_alpha: bool = True, x_bit: Optional[np.ndarray] = None) -> bytes:
+    """RGBA uint8 (height, width, 4) → A1R5G5B5 байты.
+
+    Для непрозрачных страниц бит 15 берётся из x_bit (x_bits исходных пикселей), без него —
+    1; decode_pixels → encode_pixels(..., x_bit) воспроизводит исходные байты.
+    """
+    c = rgba.astype(np.uint16)
+    r5 = (c[..., 0] * 31 + 127) // 255
+    g5 = (c[..., 1] * 31 + 127) // 255
+    b5 = (c[..., 2] * 31 + 127) // 255
+    if is_alpha:
+        a1 = c[..., 3] >= 128
+    elif x_bit is not None:
+        a1 = x_bit
+    else:
+        a1 = np.ones(c.shape[:2], dtype=bool)
+    px = (a1.astype(np.uint16) << 15) | (r5 << 10) | (g5 << 5) | b5
+    return px.astype('<u2').tobytes()
+
+
+# ------------------------------ файлы ------------------------------
+
+def dds_header(width: int, height: int, is_alpha: bool) -> bytes:
+    pixel_format = [32, 65, 0, 16, 0x7C00, 0x03E0, 0x001F, 0x8000 if is_alpha else 0]
+    header = [DDS_MAGIC, 124, 4111, height, width, width * 2, 0, 1] + [0] * 11 + pixel_format + [4096, 0, 0, 0, 0]
+    return struct.pack("<32I", *header)
+
+
+def write_dds(path: str, pixels, width: int, height: int, is_alpha: bool):
+    with open(path, "wb") as io:
+        io.write(dds_header(width, height, is_alpha))
+        io.write(pixels)
+
+
+def read_dds(path: str) -> Tuple[bytes, int, int, bool]:
+    """Только несжатый 16-битный формат, который пишут write_dds и dds_file_saver.rb."""
+    with open(path, "rb") as io:
+        data = io.read()
+    magic, _size, _flags, height, width = struct.unpack_from("<5I", data, 0)
+    bit_count, _r, _g, _b, a_mask = struct.unpack_from("<5I", data, 88)
+    if magic != DDS_MAGIC or bit_count != 16:
+        raise RuntimeError(f"{path}: unsupported DDS (expected 16-bit RGB5A1)")
+    return data[DDS_HEADER_SIZE:DDS_HEADER_SIZE + width * height * 2], width, height, a_mask != 0
+
+
+def png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def encode_png(rgba: np.ndarray, level: int = 6) -> bytes:
+    height, width = rgba.shape[:2]
+    # фильтр 0 (None) перед каждой строкой
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (PNG_SIGNATURE + png_chunk(b'IHDR', ihdr) +
+            png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)) + png_chunk(b'IEND', b''))
+
+
+def write_png(path: str, rgba: np.ndarray, level: int = 6):
+    with open(path, "wb") as io:
+        io.write(encode_png(rgba, level))
+
+
+def paeth(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+def unfilter_row(kind: int, row: np.ndarray, prev: np.ndarray, bpp: int) -> np.ndarray:
+    """None / Sub / Up — целой строкой numpy; Average и Paeth — в unfilter_wavefront."""
+    if kind == 0:
+        return row
+    if kind == 2:
+        return row + prev
+    if kind == 1:
+        # Sub: накопленная сумма по каждому каналу
+        return np.cumsum(row.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+    raise RuntimeError(f"Unsupported PNG filter {kind}")
+
+
+def unfilter_wavefront(filters: np.ndarray, data: np.ndarray, bpp: int) -> np.ndarray:
+    """Снятие фильтров любых типов сразу со всего изображения.
+
+    Пиксель (y, x) зависит от левого, верхнего и верхне-левого, поэтому все пиксели
+    одной диагонали x + y = d независимы: width + height шагов numpy вместо цикла по
+    пикселям. Изображение хранится «скошенным» — диагональ d лежит в skew[d + 2]
+    (строка y — в ячейке y + 1), и соседи берутся срезами skew[d + 1] и skew[d].
+    """
+    height, width = data.shape[0], data.shape[1] // bpp
+    diagonals = width + height - 1
+    ys, xs = np.indices((height, width))
+    src = np.zeros((diagonals, height, bpp), dtype=np.int16)
+    src[ys + xs, ys] = data.reshape(height, width, bpp)
+    skew = np.zeros((diagonals + 2, height + 1, bpp), dtype=np.int16)
+    kinds = filters.astype(np.int16)[:, None]
+
+    for d in range(diagonals):
+        y0, y1 = max(0, d - width + 1), min(height, d + 1)
+        a = skew[d + 1, y0 + 1:y1 + 1]  # (y, x - 1)
+        b = skew[d + 1, y0:y1]          # (y - 1, x)
+        c = skew[d, y0:y1]              # (y - 1, x - 1)
+        k = kinds[y0:y1]
+        pred = np.select([k == 1, k == 2, k == 3, k == 4], [a, b, (a + b) >> 1, paeth(a, b, c)], 0)
+        skew[d + 2, y0 + 1:y1 + 1] = (src[d, y0:y1] + pred) & 0xFF
+    return skew[ys + xs + 2, ys + 1].astype(np.uint8).reshape(height, width * bpp)
+
+
+def read_png(path: str) -> np.ndarray:
+    """8-битный PNG (RGB, RGBA, Gray, Gray+Alpha) без interlace → RGBA uint8 (height, width, 4)."""
+    with open(path, "rb") as io:
+        data = io.read()
+    if data[:8] != PNG_SIGNATURE:
+        raise RuntimeError(f"{path}: not a PNG file")
+    pos, idat = 8, []
+    width = height = color_type = 0
+    while pos < len(data):
+        length = struct.unpack_from(">I", data, pos)[0]
+        kind = data[pos + 4:pos + 8]
+        payload = data[pos + 8:pos + 8 + length]
+        if kind == b'IHDR':
+            width, height, depth, color_type, _c, _f, interlace = struct.unpack(">IIBBBBB", payload)
+            if depth != 8 or interlace or color_type not in (0, 2, 4, 6):
+                raise RuntimeError(f"{path}: unsupported PNG (depth {depth}, color type {color_type})")
+        elif kind == b'IDAT':
+            idat.append(payload)
+        elif kind == b'IEND':
+            break
+        pos += 12 + length
+
+    bpp = {0: 1, 2: 3, 4: 2, 6: 4}[color_type]
+    raw = np.frombuffer(zlib.decompress(b''.join(idat)), dtype=np.uint8).reshape(height, width * bpp + 1)
+    filters = raw[:, 0]
+    if filters.max(initial=0) > 4:
+        raise RuntimeError(f"{path}: unsupported PNG filter {int(filters.max())}")
+    if not filters.any():
+        pixels = raw[:, 1:]
+    elif (filters >= 3).any():
+        # Average / Paeth (адаптивная фильтрация редакторов) — диагональным фронтом
+        pixels = unfilter_wavefront(filters, raw[:, 1:], bpp)
+    else:
+        pixels = np.empty((height, width * bpp), dtype=np.uint8)
+        prev = np.zeros(width * bpp, dtype=np.uint8)
+        for y in range(height):
+            prev = pixels[y] = unfilter_row(int(filters[y]), raw[y, 1:], prev, bpp)
+    pixels = pixels.reshape(height, width, bpp)
+
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    if color_type in (0, 4):
+        rgba[..., :3] = pixels[..., :1]
+    else:
+        rgba[..., :3] = pixels[..., :3]
+    rgba[..., 3] = pixels[..., bpp - 1] if color_type in (4, 6) else 255
+    return rgba
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 3:
+        sys.stderr.write(f"Usage: python {argv[0]} world.wld output_dir [png|dds]\n")
+        return 1
+    wld_path, output = argv[1], argv[2]
+    fmt = argv[3] if len(argv) > 3 else 'png'
+    os.makedirs(output, exist_ok=True)
+
+    with WldFile(wld_path, WldIndex.open(wld_path)) as world:
+        for offset, _length in world.index.items('TEXP'):
+            t0 = time.perf_counter()
+            page = parse_page(world.data, offset)
+            start = page['pixels_offset']
+            pixels = world.view[start:start + page['pixels_length']]
+            path = os.path.join(output, f"{page['id']}.{fmt}")
+            if fmt == 'dds':
+                write_dds(path, pixels, page['width'], page['height'], page['is_alpha'])
+            else:
+                write_png(path, decode_pixels(pixels, page['width'], page['height'], page['is_alpha']))
+            pixels.release()
+            print(f"{path}  {page['width']}x{page['height']}  {(time.perf_counter() - t0) * 1000.0:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
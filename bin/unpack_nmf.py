@@ -3,6 +3,8 @@ import sys
 from pprint import pprint
 
 MATRIX_SIZE = 16
+# struct-код → dtype numpy для BufferWriter.array
+ARRAY_DTYPES = {"f": "<f4", "i": "<i4", "h": "<i2"}
 
 def read_aligned_string(f):
     # читаем байты по одному, пока не встретим \x00
@@ -29,56 +31,134 @@ def read_aligned_string(f):
 
     return name
 
+class BufferReader:
+    """read() поверх bytes/memoryview/mmap — для NMF, встроенных в другой файл."""
+
+    def __init__(self, data, offset=0):
+        self.view = memoryview(data)
+        self.pos = offset
+
+    def read(self, size=-1):
+        end = len(self.view) if size < 0 else min(self.pos + size, len(self.view))
+        chunk = bytes(self.view[self.pos:end])
+        self.pos = end
+        return chunk
+
+    def tell(self):
+        return self.pos
+
+
+class BufferWriter:
+    """pack_into в заранее выделенный bytearray.
+
+    С out=None только считает размер — так Nmf.pack узнаёт длину файла до записи.
+    Буферы вершин/индексов принимаются списками (плоскими или по строкам) и массивами
+    numpy; массивы копируются в буфер целиком, без поэлементной упаковки.
+    """
+
+    def __init__(self, out=None):
+        self.out = out
+        self.pos = 0
+
+    def pack(self, fmt, *values):
+        if self.out is not None:
+            struct.pack_into(fmt, self.out, self.pos, *values)
+        self.pos += struct.calcsize(fmt)
+
+    def word(self, token):
+        self.raw(token.encode("ascii"))
+
+    def size_at(self, pos, size):
+        if self.out is not None:
+            struct.pack_into(">I", self.out, pos, size)
+
+    def raw(self, data):
+        n = len(data)
+        if self.out is not None:
+            self.out[self.pos:self.pos + n] = data
+        self.pos += n
+
+    def name(self, string):
+        raw = string.encode("windows-1252", errors="ignore") + b"\x00"
+        self.raw(raw + b"\x00" * ((4 - len(raw) % 4) % 4))
+
+    def array(self, buf, code):
+        """Плоская запись чисел: code 'f' (float32), 'i' (int32) или 'h' (int16)."""
+        if hasattr(buf, "dtype"):
+            n = buf.size
+            if self.out is not None:
+                flat = buf.astype(ARRAY_DTYPES[code], copy=False).reshape(-1)
+                self.out[self.pos:self.pos + flat.nbytes] = memoryview(flat).cast("B")
+            self.pos += n * struct.calcsize(code)
+            return n
+        if buf and isinstance(buf[0], (list, tuple)):
+            if self.out is None:
+                n = sum(len(row) for row in buf)
+                self.pos += n * struct.calcsize(code)
+                return n
+            buf = [v for row in buf for v in row]
+        n = len(buf)
+        self.pack(f"<{n}{code}", *buf)
+        return n
+
+
 class Nmf:
     def unpack(self, path):
+        with open(path, "rb") as f:
+            return self.unpack_stream(f)
+
+    def unpack_buffer(self, data):
+        # data — bytes, memoryview или mmap; сам буфер не копируется
+        return self.unpack_stream(BufferReader(data))
+
+    def unpack_stream(self, f):
         model = []
         index = 1
 
-        with open(path, "rb") as f:
-            # ---- Заголовок (token 'NMF ')
-            token = f.read(4).decode("ascii", errors="ignore")
-            if token != "NMF ":
-                raise RuntimeError(f"Bad start of ModelList. Expected 'NMF ' but got '{token}'")
-            f.read(4) # пропуск int32 == 0
-
-            # Основной цикл по блокам до 'END '
-            while True:
-                token_bytes = f.read(4)
-                if len(token_bytes) == 0:
-                    # неожиданное завершение файла
-                    raise EOFError("Unexpected end of file while reading token")
-                token = token_bytes.decode("ascii", errors="ignore")
-
-                # размер (int BE), но используется только для пропуска/отладки
-                _size = struct.unpack(">I", f.read(4))[0]
-
-                if token == "END ":
-                    break
-
-                # метаданные узла
-                _skip = struct.unpack("<i", f.read(4))[0]  # 0 для LOCA, 2 для FRAM, JOIN, ROOT, 14 для MESH
-                parent_id = struct.unpack("<i", f.read(4))[0]
+        # ---- Заголовок (token 'NMF ')
+        token = f.read(4).decode("ascii", errors="ignore")
+        if token != "NMF ":
+            raise RuntimeError(f"Bad start of ModelList. Expected 'NMF ' but got '{token}'")
+        f.read(4) # пропуск int32 == 0
 
-                name = read_aligned_string(f)
+        # Основной цикл по блокам до 'END '
+        while True:
+            token_bytes = f.read(4)
+            if len(token_bytes) == 0:
+                # неожиданное завершение файла
+                raise EOFError("Unexpected end of file while reading token")
+            token = token_bytes.decode("ascii", errors="ignore")
 
-                # Разбор по типу токена
-                if token == "ROOT":
-                    data = self._parse_fram(f)
-                elif token == "LOCA":
-                    data = {}  # в исходнике пусто
-                elif token == "FRAM":
-                    data = self._parse_fram(f)
-                elif token == "JOIN":
-                    data = self._parse_join(f)
-                elif token == "MESH":
-                    data = self._parse_mesh(f)
-                else:
-                    raise RuntimeError(f"Unexpected token in MODEL: {token}")
-
-                model.append(
-                    {"word": token, "name": name, "parent_id": parent_id, "data": data, "index": index}
-                )
-                index += 1
+            # размер (int BE), но используется только для пропуска/отладки
+            _size = struct.unpack(">I", f.read(4))[0]
+
+            if token == "END ":
+                break
+
+            # метаданные узла
+            _skip = struct.unpack("<i", f.read(4))[0]  # 0 для LOCA, 2 для FRAM, JOIN, ROOT, 14 для MESH
+            parent_id = struct.unpack("<i", f.read(4))[0]
+
+            name = read_aligned_string(f)
+
+            # Разбор по типу токена
+            if token == "ROOT":
+                data = self._parse_fram(f)
+            elif token == "LOCA":
+                data = {}  # в исходнике пусто
+            elif token == "FRAM":
+                data = self._parse_fram(f)
+            elif token == "JOIN":
+                data = self._parse_join(f)
+            elif token == "MESH":
+                data = self._parse_mesh(f)
+            else:
+                raise RuntimeError(f"Unexpected token in MODEL: {token}")
+
+            model.append(
+                {"word": token, "name": name, "parent_id": parent_id, "data": data, "index": index}
+            )
+            index += 1
 
         return model
 
@@ -338,6 +418,152 @@ class Nmf:
         }
 
 
+    # -------------------- запись --------------------
+
+    NODE_KINDS = {"LOCA": 0, "ROOT": 2, "FRAM": 2, "JOIN": 2, "MESH": 14}
+
+    def pack(self, nodes):
+        """Обратное unpack(): узлы → байты NMF (как Wld::Items::Nmf#pack в Ruby).
+
+        Первый проход считает длину, второй заполняет заранее выделенный bytearray.
+        Отсутствующие ANIM/текстуры пишутся нулевым словом, анимации меша
+        завершаются нулевым словом — неизменённый вход совпадает побайтно.
+        """
+        nodes = sorted(nodes, key=lambda n: n.get("index", 0))
+        sizer = BufferWriter()
+        self._pack_nodes(sizer, nodes)
+        writer = BufferWriter(bytearray(sizer.pos))
+        self._pack_nodes(writer, nodes)
+        return writer.out
+
+    def pack_file(self, nodes, path):
+        with open(path, "wb") as f:
+            f.write(self.pack(nodes))
+
+    def _pack_nodes(self, w, nodes):
+        w.word("NMF ")
+        w.pack("<i", 0)
+        for node in nodes:
+            token = node["word"]
+            if token not in self.NODE_KINDS:
+                raise RuntimeError(f"Unexpected token in MODEL: {token}")
+            w.word(token)
+            size_pos = w.pos
+            w.pack("<i", 0)
+            start = w.pos
+
+            w.pack("<2i", self.NODE_KINDS[token], node["parent_id"])
+            w.name(node["name"])
+            data = node["data"]
+            if token in ("ROOT", "FRAM"):
+                self._pack_fram(w, data)
+            elif token == "JOIN":
+                self._pack_join(w, data)
+            elif token == "MESH":
+                self._pack_mesh(w, data)
+            w.size_at(size_pos, w.pos - start)
+        w.word("END ")
+        w.pack("<i", 0)
+
+    def _pack_matrix(self, w, matrix):
+        w.array(matrix, "f")
+
+    def _pack_fram(self, w, data):
+        self._pack_matrix(w, data["matrix"])
+        for key in ["translation", "scaling", "rotation", "rotate_pivot_translate",
+                    "rotate_pivot", "scale_pivot_translate", "scale_pivot", "shear"]:
+            w.pack("<3f", *data[key])
+        self._pack_anim(w, data.get("anim"))
+
+    def _pack_join(self, w, data):
+        self._pack_matrix(w, data["matrix"])
+        for key in ["translation", "scaling", "rotation"]:
+            w.pack("<3f", *data[key])
+        self._pack_matrix(w, data["rotation_matrix"])
+        w.pack("<3f", *data["min_rot_limit"])
+        w.pack("<3f", *data["max_rot_limit"])
+        self._pack_anim(w, data.get("anim"))
+
+    def _pack_anim(self, w, anim):
+        if not anim:
+            w.pack("<i", 0)
+            return
+        w.word("ANIM")
+        w.pack("<i", anim["unknown"])
+        keys = ["translation", "rotation", "scaling"]
+        for key in keys:
+            values = anim[key]["values"]
+            w.pack("<3i", *(len(values[axis]) if axis in values else 0 for axis in "xyz"))
+        for key in keys:
+            for axis in "xyz":
+                if axis in anim[key]["keys"]:
+                    w.array(anim[key]["keys"][axis], "f")
+                    w.array(anim[key]["values"][axis], "f")
+
+    def _pack_mesh(self, w, data):
+        w.pack("<i", data["tnum"])
+        vnum_pos = w.pos
+        w.pack("<i", 0)
+        vnum = w.array(data["vbuf"], "f") // 10
+        if w.out is not None:
+            struct.pack_into("<i", w.out, vnum_pos, vnum)
+        w.array(data["uvpt"], "f")
+
+        inum_pos = w.pos
+        w.pack("<i", 0)
+        inum = w.array(data["ibuf"], "h")
+        if w.out is not None:
+            struct.pack_into("<i", w.out, inum_pos, inum)
+        if inum % 2 == 1:
+            w.pack("<h", 0)
+
+        w.pack("<5i", data["backface_culling"], data["complex"], data["inside"], data["smooth"], data["light_flare"])
+
+        materials = data.get("materials") or []
+        w.pack("<i", len(materials))
+        for mtrl in materials:
+            self._pack_mtrl(w, mtrl)
+
+        for anim in data.get("mesh_anim") or []:
+            w.word("ANIM")
+            w.pack("<2i", anim["unknown_bool"], len(anim["unknown_ints"]))
+            w.array(anim["unknown_ints"], "i")
+            w.pack("<3f", *anim["unknown_floats"])
+            w.pack("<3i", anim["unknown_size1"], anim["unknown_size2"], anim["unknown_size3"])
+            w.array(anim["unknown_floats1"], "f")
+            w.array(anim["unknown_floats2"], "f")
+            w.array(anim["unknown_floats3"], "f")
+        w.pack("<i", 0)
+
+        floats = data.get("unknown_floats") or []
+        w.pack("<i", len(floats) // 3)
+        w.array(floats, "f")
+        ints = data.get("unknown_ints") or []
+        w.pack("<i", len(ints))
+        w.array(ints, "i")
+
+    def _pack_mtrl(self, w, mtrl):
+        w.word("MTRL")
+        w.name(mtrl["name"])
+        w.pack("<i", mtrl["blend_mode"])
+        w.pack("<4i", *mtrl["unknown_ints"])
+        w.pack("<3i", mtrl["uv_mapping_flip_horizontal"], mtrl["uv_mapping_flip_vertical"], mtrl["rotate"])
+        w.pack("<10f", mtrl["horizontal_stretch"], mtrl["vertical_stretch"],
+               mtrl["red"], mtrl["green"], mtrl["blue"], mtrl["alpha"],
+               mtrl["red2"], mtrl["green2"], mtrl["blue2"], mtrl["alpha2"])
+        w.pack("<9i", *mtrl["unknown_zero_ints"])
+        if mtrl.get("texture"):
+            tex = mtrl["texture"]
+            w.word("TXPG")
+            w.name(tex["name"])
+            w.pack("<6i", tex["texture_page"], tex["index_texture_on_page"], tex["x0"], tex["y0"], tex["x2"], tex["y2"])
+        elif mtrl.get("text"):
+            w.word("TEXT")
+            w.name(mtrl["text"]["name"])
+        else:
+            w.pack("<i", 0)
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python nmf_parser.py <path_to_nmf_file>")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from wld_index import WldIndex
+from wld_models import WldFile
+from wld_tree import NODE_MODEL, TreeArrays
+
+
+class ConnectionGraph:
+    """Связи connections (to, flag) моделей мира в виде CSR.
+
+    Вершина — строка TreeArrays (id узла - 2). indptr/indices/flags — исходящие
+    связи как в файле; undirected_* — симметричный граф для достижимости и компонент.
+    Ссылки на несуществующие узлы или узлы не-моделей собираются в dangling.
+    """
+
+    def __init__(self, tree: TreeArrays):
+        self.tree = tree
+        n = len(tree)
+        src, dst, flags, dangling = [], [], [], []
+        for row in np.flatnonzero(tree.type == NODE_MODEL):
+            for to, flag in tree.nodes[row].get('connections', []):
+                to_row = to - 2
+                if 0 <= to_row < n and tree.type[to_row] == NODE_MODEL:
+                    src.append(row)
+                    dst.append(to_row)
+                    flags.append(flag)
+                else:
+                    dangling.append((int(tree.ids[row]), to, flag))
+        self.dangling: List[Tuple[int, int, int]] = dangling
+
+        src_a = np.array(src, dtype=np.int64)
+        dst_a = np.array(dst, dtype=np.int64)
+        self.indptr, self.indices, self.flags = build_csr(n, src_a, dst_a, np.array(flags, dtype=np.int32))
+        both_src = np.concatenate([src_a, dst_a])
+        both_dst = np.concatenate([dst_a, src_a])
+        self.undirected_indptr, self.undirected_indices, _ = build_csr(n, both_src, both_dst)
+
+    @property
+    def degree(self) -> np.ndarray:
+        return np.diff(self.undirected_indptr)
+
+    def neighbors(self, rows: np.ndarray, directed: bool = False) -> np.ndarray:
+        """Все соседи набора вершин одним срезом (без цикла по вершинам)."""
+        indptr, indices = (self.indptr, self.indices) if directed else (self.undirected_indptr, self.undirected_indices)
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64)
+        # позиции в indices: starts[i] .. ends[i] для каждого i подряд
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return indices[offsets + np.arange(lengths.sum())]
+
+    def bfs(self, sources: Sequence[int], directed: bool = False) -> np.ndarray:
+        """Расстояние в рёбрах от sources (строки) до каждой вершины; -1 — недостижима."""
+        dist = np.full(len(self.tree), -1, dtype=np.int64)
+        frontier = np.unique(np.asarray(sources, dtype=np.int64))
+        dist[frontier] = 0
+        level = 0
+        while frontier.size:
+            level += 1
+            nxt = self.neighbors(frontier, directed)
+            nxt = np.unique(nxt[dist[nxt] < 0])
+            dist[nxt] = level
+            frontier = nxt
+        return dist
+
+    def components(self) -> np.ndarray:
+        """Метка компоненты для каждой вершины-модели (метка = наименьшая строка); -1 у не-моделей."""
+        labels = np.where(self.tree.type == NODE_MODEL, np.arange(len(self.tree)), -1)
+        src = np.repeat(np.arange(len(self.tree)), self.degree)
+        dst = self.undirected_indices
+        # распространение минимальной метки до неподвижной точки
+        while True:
+            candidate = labels.copy()
+            np.minimum.at(candidate, src, labels[dst])
+            models = candidate >= 0
+            candidate[models] = candidate[candidate[models]]  # сжатие путей
+            if np.array_equal(candidate, labels):
+                return labels
+            labels = candidate
+
+
+def build_csr(n: int, src: np.ndarray, dst: np.ndarray,
+              data: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order], data[order] if data is not None else None
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Validate world model connections (orphans, unreachable pieces)")
+    parser.add_argument('world', help="path to the .wld file")
+    parser.add_argument('--root', type=int, action='append',
+                        help="TREE node id to start reachability from (default: the largest component)")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    with WldFile(args.world, WldIndex.open(args.world)) as world:
+        tree = TreeArrays.load(world)
+    graph = ConnectionGraph(tree)
+    t_build = time.perf_counter()
+
+    models = np.flatnonzero(tree.type == NODE_MODEL)
+    labels = graph.components()
+    sizes = np.bincount(labels[models], minlength=len(tree))
+    component_ids = np.flatnonzero(sizes)
+    orphans = models[graph.degree[models] == 0]
+
+    if args.root:
+        roots = np.array(args.root, dtype=np.int64) - 2
+    else:
+        roots = np.flatnonzero(labels == np.argmax(sizes)) if models.size else np.empty(0, dtype=np.int64)
+    dist = graph.bfs(roots)
+    unreachable = models[dist[models] < 0]
+    t_query = time.perf_counter()
+
+    print(f"{models.size} models, {graph.indices.size} connections, {component_ids.size} components "
+          f"(largest {sizes.max(initial=0)})")
+    print(f"Orphaned (no connections): {orphans.size}")
+    for row in orphans:
+        print(f"  {tree.ids[row]:>7}  {tree.nodes[row]['folder_name']}")
+    print(f"Unreachable from roots: {unreachable.size}")
+    for row in unreachable:
+        print(f"  {tree.ids[row]:>7}  {tree.nodes[row]['folder_name']}  component {tree.ids[labels[row]]}")
+    if graph.dangling:
+        print(f"Dangling connections: {len(graph.dangling)}")
+        for node, to, flag in graph.dangling:
+            print(f"  {node:>7} -> {to} (flag {flag})")
+    print(f"build {(t_build - t0) * 1000.0:.1f} ms, analysis {(t_query - t_build) * 1000.0:.1f} ms")
+    return 1 if unreachable.size or graph.dangling else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
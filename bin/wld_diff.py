@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import difflib
+import json
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from texture_codec import parse_page
+from unpack_nmf import Nmf
+from wld_index import NAME_OFFSETS, SECTIONS, index_path_for
+from wld_models import WldFile, parse_model_header
+from wld_tree import parse_node
+
+# type: added / removed / changed / type_mismatch (как в helper_tools/diff_json.rb)
+DiffItem = Tuple[str, str, Any, Any]
+
+
+def json_pointer(parts: List[Any]) -> str:
+    return '/' + '/'.join(str(p).replace('~', '~0').replace('/', '~1') for p in parts)
+
+
+def is_number(x: Any) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def diff_values(left: Any, right: Any, path: List[Any], epsilon: float, out: List[DiffItem]):
+    """Порт diff_values из diff_json.rb для уже декодированных элементов."""
+    if isinstance(left, dict) and isinstance(right, dict):
+        for k in list(left.keys()) + [k for k in right.keys() if k not in left]:
+            if k not in left:
+                out.append(('added', json_pointer(path + [k]), None, right[k]))
+            elif k not in right:
+                out.append(('removed', json_pointer(path + [k]), left[k], None))
+            else:
+                diff_values(left[k], right[k], path + [k], epsilon, out)
+    elif isinstance(left, (list, tuple)) and isinstance(right, (list, tuple)):
+        common = min(len(left), len(right))
+        for i in range(common):
+            diff_values(left[i], right[i], path + [i], epsilon, out)
+        for i in range(common, len(left)):
+            out.append(('removed', json_pointer(path + [i]), left[i], None))
+        for i in range(common, len(right)):
+            out.append(('added', json_pointer(path + [i]), None, right[i]))
+    elif is_number(left) and is_number(right):
+        if abs(left - right) > epsilon:
+            out.append(('changed', json_pointer(path), left, right))
+    elif type(left) is not type(right):
+        out.append(('type_mismatch', json_pointer(path), left, right))
+    elif left != right:
+        out.append(('changed', json_pointer(path), left, right))
+
+
+# ------------------------------ ключи и декодирование элементов ------------------------------
+
+def item_keys(world: WldFile, marker: str) -> Optional[List[Any]]:
+    """Ключ сопоставления элементов двух миров: имя (с номером повтора) или id страницы.
+
+    None — у элементов секции (TREE, MAKL) нет ключа, их сопоставляет match_items.
+    """
+    items = world.index.items(marker)
+    if marker in NAME_OFFSETS:
+        seen: Dict[str, int] = {}
+        keys = []
+        for item in items:
+            name = item[2]
+            keys.append(f"{name}#{seen.get(name, 0)}" if name in seen else name)
+            seen[name] = seen.get(name, 0) + 1
+        return keys
+    if marker == 'TEXP':
+        return [struct.unpack_from("<i", world.data, offset + 12)[0] for offset, _length in items]
+    return None
+
+
+# (ключ для пути, позиция слева, позиция справа); None — элемента с этой стороны нет
+Match = Tuple[Any, Optional[int], Optional[int]]
+
+
+def match_items(left: WldFile, right: WldFile, marker: str) -> List[Match]:
+    """Пары элементов секции. Без ключей списки хэшей выравниваются difflib, так что
+    вставка одного узла не сдвигает все следующие; в заменённых участках пары идут по порядку."""
+    lkeys, rkeys = item_keys(left, marker), item_keys(right, marker)
+    if lkeys is not None:
+        rpos = {k: i for i, k in enumerate(rkeys)}
+        lset = set(lkeys)
+        matches: List[Match] = [(key, lp, rpos.get(key)) for lp, key in enumerate(lkeys)]
+        return matches + [(key, None, rp) for rp, key in enumerate(rkeys) if key not in lset]
+
+    lhash, rhash = left.index.sections[marker]['hashes'], right.index.sections[marker]['hashes']
+    matches = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, lhash, rhash, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            continue
+        common = min(i2 - i1, j2 - j1)
+        matches += [(i1 + k, i1 + k, j1 + k) for k in range(common)]
+        matches += [(lp, lp, None) for lp in range(i1 + common, i2)]
+        matches += [(rp, None, rp) for rp in range(j1 + common, j2)]
+    return matches
+
+
+def decode_item(world: WldFile, marker: str, position: int) -> Any:
+    offset, length = world.index.item(marker, position)[:2]
+    if marker == 'LIST':
+        info = parse_model_header(world.data, offset)
+        nmf = world.view[info['nmf_offset']:offset + length]
+        try:
+            nodes = Nmf().unpack_buffer(nmf)
+        finally:
+            nmf.release()
+        return {'name': info['name'], 'parent_folder_iid': info['parent_folder_iid'], 'nmf': nodes}
+    if marker == 'TREE':
+        node = parse_node(world.data, offset)
+        shad = node.get('shad')
+        if shad:
+            node['shad'] = {'size1': shad['size1'], 'size2': shad['size2'],
+                            'data': bytes(world.data[shad['offset']:shad['offset'] + shad['length']]).hex()}
+        node['payload_length'] = length
+        return node
+    if marker == 'TEXP':
+        page = parse_page(world.data, offset)
+        start = page.pop('pixels_offset')
+        page.pop('pixels_length')
+        count = page['width'] * page['height']
+        page['pixels'] = np.frombuffer(world.data, dtype='<u2', count=count, offset=start).copy()
+        return page
+    return {'length': length}
+
+
+def diff_item(marker: str, left: Any, right: Any, path: List[Any], epsilon: float, out: List[DiffItem]):
+    if marker == 'TEXP':
+        lp, rp = left.pop('pixels'), right.pop('pixels')
+        diff_values(left, right, path, epsilon, out)
+        if lp.shape == rp.shape:
+            changed = int(np.count_nonzero(lp != rp))
+            if changed:
+                out.append(('changed', json_pointer(path + ['pixels']), f"{changed}/{lp.size}", "pixels differ"))
+        return
+    if marker not in ('LIST', 'TREE'):
+        # разбор этих секций здесь не нужен: хэш уже сказал, что байты отличаются
+        out.append(('changed', json_pointer(path + ['payload']), f"{left['length']} bytes", f"{right['length']} bytes"))
+        return
+    diff_values(left, right, path, epsilon, out)
+
+
+# ------------------------------ сравнение миров ------------------------------
+
+def open_hashed(path: str) -> WldFile:
+    world = WldFile(path)
+    if world.index.content_hashes(world.view):
+        try:
+            world.index.save(index_path_for(path))
+        except OSError:
+            pass
+    return world
+
+
+def diff_worlds(left: WldFile, right: WldFile, epsilon: float) -> Tuple[List[DiffItem], Dict[str, int]]:
+    out: List[DiffItem] = []
+    stats = {'items': 0, 'decoded': 0}
+    for marker in SECTIONS:
+        lhash, rhash = left.index.sections[marker]['hashes'], right.index.sections[marker]['hashes']
+        stats['items'] += len(lhash)
+        for key, lp, rp in match_items(left, right, marker):
+            if rp is None:
+                out.append(('removed', json_pointer([marker, key]), f"item {lp}", None))
+            elif lp is None:
+                out.append(('added', json_pointer([marker, key]), None, f"item {rp}"))
+            elif lhash[lp] != rhash[rp]:
+                stats['decoded'] += 1
+                diff_item(marker, decode_item(left, marker, lp), decode_item(right, marker, rp),
+                          [marker, key], epsilon, out)
+    return out, stats
+
+
+def diff_nmf_files(left_path: str, right_path: str, epsilon: float) -> List[DiffItem]:
+    out: List[DiffItem] = []
+    diff_values(Nmf().unpack(left_path), Nmf().unpack(right_path), [], epsilon, out)
+    return out
+
+
+# ------------------------------ CLI ------------------------------
+
+def short(value: Any, limit: int = 120) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Structural diff of two .wld (or two .nmf) files")
+    parser.add_argument('left')
+    parser.add_argument('right')
+    parser.add_argument('-e', '--epsilon', type=float, default=0.001, help="numeric tolerance")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--limit', type=int, default=50, help="max differences printed per item (0 = all)")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    stats: Optional[Dict[str, int]] = None
+    if args.left.lower().endswith('.nmf'):
+        diffs = diff_nmf_files(args.left, args.right, args.epsilon)
+    else:
+        with open_hashed(args.left) as left, open_hashed(args.right) as right:
+            diffs, stats = diff_worlds(left, right, args.epsilon)
+    elapsed = time.perf_counter() - t0
+
+    summary = {t: sum(1 for d in diffs if d[0] == t) for t in ('added', 'removed', 'changed', 'type_mismatch')}
+    if args.json:
+        print(json.dumps({'summary': summary, 'epsilon': args.epsilon, 'stats': stats,
+                          'diffs': [{'type': t, 'path': p, 'left': l, 'right': r} for t, p, l, r in diffs]},
+                         ensure_ascii=False, indent=2, default=str))
+        return 1 if diffs else 0
+
+    if not diffs:
+        print(f"Файлы идентичны (epsilon={args.epsilon}).")
+    else:
+        print(f"Найдены различия (epsilon={args.epsilon}):")
+        per_item: Dict[str, int] = {}
+        for kind, path, left, right in diffs:
+            item = '/'.join(path.split('/')[:3])
+            per_item[item] = per_item.get(item, 0) + 1
+            if args.limit and per_item[item] > args.limit:
+                if per_item[item] == args.limit + 1:
+                    print(f"          ... more differences in {item}")
+                continue
+            if kind == 'added':
+                print(f"[ADDED]   {path}\n          -> {short(right)}")
+            elif kind == 'removed':
+                print(f"[REMOVED] {path}\n          <- {short(left)}")
+            elif kind == 'changed':
+                print(f"[CHANGED] {path}\n          {short(left)} -> {short(right)}")
+            else:
+                print(f"[TYPE]    {path}\n          {type(left).__name__} {short(left)}  vs  "
+                      f"{type(right).__name__} {short(right)}")
+        print(f"\nИтого: added={summary['added']}, removed={summary['removed']}, "
+              f"changed={summary['changed']}, type_mismatch={summary['type_mismatch']}")
+    if stats:
+        print(f"{stats['items']} items compared by hash, {stats['decoded']} decoded, {elapsed * 1000.0:.1f} ms")
+    return 1 if diffs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+# Порядок секций в WRLD и маркеры их элементов (см. Readme: Supported MARKERs)
+SECTIONS = ('TEXP', 'GROU', 'OBGR', 'LIST', 'OBJS', 'MAKL', 'TREE')
+ITEM_MARKERS = {
+    'TEXP': 'PAGE',
+    'GROU': 'ENTR',
+    'OBGR': 'ENTR',
+    'LIST': 'MODL',
+    'OBJS': 'OBJ ',
+    'MAKL': 'OBJ ',
+    'TREE': 'NODE',
+}
+# смещение строки name внутри payload элемента (после служебных int32)
+NAME_OFFSETS = {'GROU': 4, 'OBGR': 4, 'LIST': 8, 'OBJS': 4}
+
+INDEX_FORMAT = 1
+INDEX_EXT = ".idx.json"
+
+
+def read_cstring(data, pos: int) -> str:
+    end = data.find(b'\x00', pos)
+    if end < 0:
+        raise RuntimeError(f"Null terminator not found at offset {pos}")
+    return bytes(data[pos:end]).decode('windows-1252', errors='ignore')
+
+
+def index_path_for(wld_path: str) -> str:
+    return wld_path + INDEX_EXT
+
+
+def source_stamp(wld_path: str) -> Dict[str, int]:
+    st = os.stat(wld_path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+class WldIndex:
+    """Смещения секций и элементов WLD.
+
+    Для каждого элемента хранится [offset, length(, name)], где offset указывает на
+    payload сразу за маркером и big-endian размером, а length — этот размер.
+    """
+
+    def __init__(self, sections: Dict[str, Dict[str, Any]], source: Optional[Dict[str, int]] = None):
+        self.sections = sections
+        self.source = source or {}
+
+    # ------------------------------ построение ------------------------------
+
+    @classmethod
+    def build(cls, data, source: Optional[Dict[str, int]] = None) -> "WldIndex":
+        if bytes(data[0:4]) != b'WRLD':
+            raise RuntimeError(f"Not a WLD file. Expected 'WRLD' but got '{bytes(data[0:4])!r}'")
+
+        pos = 8
+        sections: Dict[str, Dict[str, Any]] = {}
+        for marker in SECTIONS:
+            token = bytes(data[pos:pos + 4]).decode('ascii', errors='ignore')
+            if token != marker:
+                raise RuntimeError(f"Unexpected section at offset {pos}. Expected '{marker}' but got '{token}'")
+            start = pos
+            pos += 8
+
+            separator = ITEM_MARKERS[marker].encode('ascii')
+            name_offset = NAME_OFFSETS.get(marker)
+            items: List[List[Any]] = []
+            while True:
+                token_bytes = bytes(data[pos:pos + 4])
+                if token_bytes == b'END ':
+                    pos += 8
+                    break
+                if token_bytes != separator:
+                    raise RuntimeError(f"Unexpected token in {marker} at offset {pos}: '{token_bytes!r}'")
+                size = struct.unpack_from(">I", data, pos + 4)[0]
+                item: List[Any] = [pos + 8, size]
+                if name_offset is not None:
+                    item.append(read_cstring(data, pos + 8 + name_offset))
+                items.append(item)
+                pos += 8 + size
+            sections[marker] = {'offset': start, 'length': pos - start, 'items': items}
+
+        token = bytes(data[pos:pos + 4])
+        if token != b'EOF ':
+            raise RuntimeError(f"Expected 'EOF ' at offset {pos} but got '{token!r}'")
+        return cls(sections, source)
+
+    @classmethod
+    def build_from_file(cls, wld_path: str) -> "WldIndex":
+        with open(wld_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return cls.build(data, source_stamp(wld_path))
+
+    # ------------------------------ sidecar ------------------------------
+
+    def to_hash(self) -> Dict[str, Any]:
+        return {'format': INDEX_FORMAT, 'source': self.source, 'sections': self.sections}
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as io:
+            json.dump(self.to_hash(), io, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "WldIndex":
+        with open(path, 'r', encoding='utf-8') as io:
+            raw = json.load(io)
+        if raw.get('format') != INDEX_FORMAT:
+            raise RuntimeError(f"Unsupported index format in {path}: {raw.get('format')}")
+        return cls(raw['sections'], raw.get('source'))
+
+    @classmethod
+    def open(cls, wld_path: str, rebuild: bool = False) -> "WldIndex":
+        """Индекс из sidecar-файла, если он свежий; иначе строит и сохраняет заново."""
+        idx_path = index_path_for(wld_path)
+        if not rebuild and os.path.exists(idx_path):
+            try:
+                index = cls.load(idx_path)
+                if index.source == source_stamp(wld_path):
+                    return index
+            except (OSError, ValueError, KeyError, RuntimeError):
+                pass
+        index = cls.build_from_file(wld_path)
+        try:
+            index.save(idx_path)
+        except OSError:
+            pass  # каталог только для чтения — работаем без sidecar
+        return index
+
+    # ------------------------------ доступ ------------------------------
+
+    def items(self, marker: str) -> List[List[Any]]:
+        return self.sections[marker]['items']
+
+    def item(self, marker: str, position: int) -> List[Any]:
+        return self.sections[marker]['items'][position]
+
+    def content_hashes(self, data) -> bool:
+        """blake2b payload каждого элемента в sections[marker]['hashes'].
+
+        Хэши сохраняются в sidecar вместе с индексом; возвращает True, если что-то
+        пришлось посчитать (и sidecar стоит перезаписать).
+        """
+        computed = False
+        for marker in SECTIONS:
+            sec = self.sections[marker]
+            if 'hashes' in sec:
+                continue
+            sec['hashes'] = [hashlib.blake2b(data[item[0]:item[0] + item[1]], digest_size=16).hexdigest()
+                             for item in sec['items']]
+            computed = True
+        return computed
+
+    def iter_items(self) -> Iterator[tuple]:
+        for marker in SECTIONS:
+            for position, item in enumerate(self.sections[marker]['items']):
+                yield marker, position, item
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2:
+        sys.stderr.write(f"Usage: python {argv[0]} world.wld [--rebuild]\n")
+        return 1
+    wld_path = argv[1]
+    index = WldIndex.open(wld_path, rebuild='--rebuild' in argv[2:])
+    for marker in SECTIONS:
+        sec = index.sections[marker]
+        print(f"{marker}  offset={sec['offset']:<10} length={sec['length']:<10} items={len(sec['items'])}")
+    print(f"Index: {index_path_for(wld_path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
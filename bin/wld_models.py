@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from unpack_nmf import Nmf
+from wld_index import WldIndex, read_cstring
+
+CAMERA_SIZE = 10 * 4        # RMAC: coordinates_camera + coordinates_item, float[5] каждый
+ATTACK_POINT_SIZE = 4 * 4   # x, y, z, radius
+
+
+def aligned_name_end(data, pos: int) -> int:
+    end = data.find(b'\x00', pos) + 1
+    return end + (4 - end % 4) % 4
+
+
+def parse_model_header(data, offset: int) -> Dict[str, Any]:
+    """Заголовок MODL (payload с offset) без разбора NMF.
+
+    Возвращает name, parent_folder_iid и nmf_offset — абсолютное смещение 'NMF '.
+    """
+    pos = offset + 8  # константы 9 и 1
+    name = read_cstring(data, pos)
+    pos = aligned_name_end(data, pos)
+    pos += 5 * 4      # influences_camera, no_camera_check, anti_ground, default_skeleton, use_skeleton
+    if bytes(data[pos:pos + 4]) == b'RMAC':
+        pos += CAMERA_SIZE
+    pos += 4
+    parent_folder_iid = struct.unpack_from("<i", data, pos)[0]
+    pos += 4
+    count_of_attack_points = struct.unpack_from("<i", data, pos)[0]
+    pos += 4 + count_of_attack_points * ATTACK_POINT_SIZE
+    if bytes(data[pos:pos + 4]) != b'NMF ':
+        raise RuntimeError(f"Model '{name}': expected 'NMF ' at offset {pos} but got '{bytes(data[pos:pos + 4])!r}'")
+    return {'name': name, 'parent_folder_iid': parent_folder_iid, 'nmf_offset': pos}
+
+
+class WldFile:
+    """WLD, отображённый в память, с индексом секций.
+
+    data — сам mmap (для struct.unpack_from / np.frombuffer), view — memoryview над ним.
+    Срезы, которые возвращает model_nmf(), ссылаются на mmap; их нужно отпустить
+    (release() или выйти из области видимости) до close().
+    """
+
+    def __init__(self, path: str, index: Optional[WldIndex] = None):
+        self.path = path
+        self.index = index or WldIndex.open(path)
+        self._file = open(path, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+
+    def close(self):
+        self.view.release()
+        self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------ модели ------------------------------
+
+    @staticmethod
+    def model_id(position: int) -> int:
+        # id модели совпадает с Ruby: индекс в LIST + 2
+        return position + 2
+
+    def model_position(self, key: Union[int, str]) -> int:
+        items = self.index.items('LIST')
+        if isinstance(key, int):
+            position = key - 2
+            if not 0 <= position < len(items):
+                raise KeyError(f"Model id {key} out of range (2..{len(items) + 1})")
+            return position
+        for position, item in enumerate(items):
+            if item[2] == key:
+                return position
+        raise KeyError(f"Model '{key}' not found")
+
+    def model_info(self, key: Union[int, str]) -> Dict[str, Any]:
+        position = self.model_position(key)
+        offset, length = self.index.item('LIST', position)[:2]
+        info = parse_model_header(self.data, offset)
+        info['id'] = self.model_id(position)
+        info['nmf_length'] = offset + length - info['nmf_offset']
+        return info
+
+    def model_nmf(self, key: Union[int, str]) -> memoryview:
+        info = self.model_info(key)
+        start = info['nmf_offset']
+        return self.view[start:start + info['nmf_length']]
+
+    def unpack_model(self, key: Union[int, str]) -> List[Dict[str, Any]]:
+        nmf = self.model_nmf(key)
+        try:
+            return Nmf().unpack_buffer(nmf)
+        finally:
+            nmf.release()
+
+
+def parse_model_key(value: str) -> Union[int, str]:
+    return int(value) if value.isdigit() else value
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 3:
+        sys.stderr.write(f"Usage: python {argv[0]} world.wld <model_id|model_name> [output.nmf]\n")
+        return 1
+    wld_path, key = argv[1], parse_model_key(argv[2])
+
+    t0 = time.perf_counter()
+    with WldFile(wld_path) as world:
+        info = world.model_info(key)
+        nmf = world.model_nmf(key)
+        if len(argv) > 3:
+            with open(argv[3], "wb") as io:
+                io.write(nmf)
+            print(f"Wrote {argv[3]}")
+        nodes = Nmf().unpack_buffer(nmf)
+        nmf.release()
+    elapsed = (time.perf_counter() - t0) * 1000.0
+
+    print(f"Model {info['id']} '{info['name']}': {info['nmf_length']} bytes, {len(nodes)} nodes ({elapsed:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from texture_codec import parse_page, read_dds
+from wld_index import WldIndex, index_path_for, source_stamp
+from wld_models import WldFile, parse_model_key
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+# замена: (marker, position, новый payload)
+Patch = Tuple[str, int, bytes]
+
+
+# ------------------------------ новые payload ------------------------------
+
+def model_payload(world: WldFile, key, nmf: bytes) -> Tuple[int, bytes]:
+    """Заголовок MODL из исходного мира + новый NMF."""
+    if bytes(nmf[:4]) != b'NMF ':
+        raise RuntimeError("Replacement model does not start with 'NMF '")
+    position = world.model_position(key)
+    info = world.model_info(key)
+    offset = world.index.item('LIST', position)[0]
+    return position, bytes(world.view[offset:info['nmf_offset']]) + bytes(nmf)
+
+
+def page_payload(world: WldFile, page_id: int, dds_path: str) -> Tuple[int, bytes]:
+    """PAGE с пикселями из .dds; при другом размере прямоугольники масштабируются, как в pack.rb."""
+    for position, (offset, _length) in enumerate(world.index.items('TEXP')):
+        page = parse_page(world.data, offset)
+        if page['id'] == page_id:
+            break
+    else:
+        raise KeyError(f"Texture page {page_id} not found")
+
+    pixels, width, height, is_alpha = read_dds(dds_path)
+    if width * page['height'] != height * page['width']:
+        raise RuntimeError(f"{dds_path}: {width}x{height} does not keep the {page['width']}x{page['height']} aspect")
+    scale = width / page['width']
+
+    out = bytearray(struct.pack("<5i", 2, width, height, page_id, len(page['textures'])))
+    for tex in page['textures']:
+        name = tex['filepath'].encode('windows-1252', errors='ignore') + b'\x00'
+        out += name + b'\x00' * ((4 - len(name) % 4) % 4)
+        out += struct.pack("<4i", *(int(v * scale) for v in tex['box'].values()))
+        out += struct.pack("<4i", *tex['source_box'].values())
+    out += b'TXPG' + struct.pack("<i", -1 if is_alpha else 0)
+    out += pixels
+    return position, bytes(out)
+
+
+# ------------------------------ запись ------------------------------
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, length: int):
+    """Копирование диапазона файла ядром (copy_file_range / sendfile), с запасным read/write."""
+    end = offset + length
+    while offset < end:
+        count = min(COPY_CHUNK, end - offset)
+        try:
+            if hasattr(os, 'copy_file_range'):
+                sent = os.copy_file_range(src_fd, dst_fd, count, offset)
+            else:
+                sent = os.sendfile(dst_fd, src_fd, offset, count)
+        except OSError:
+            sent = 0
+        if sent <= 0:
+            # разные файловые системы и т.п. — обычное копирование
+            os.lseek(src_fd, offset, os.SEEK_SET)
+            chunk = os.read(src_fd, count)
+            if not chunk:
+                raise RuntimeError(f"Unexpected end of source at offset {offset} (expected {end - offset} more bytes)")
+            os.write(dst_fd, chunk)
+            sent = len(chunk)
+        offset += sent
+
+
+def check_unique(patches: List[Patch]):
+    """Две замены одного элемента (например, по номеру и по имени) — ошибка, а не испорченный мир."""
+    seen = set()
+    for marker, position, _payload in patches:
+        if (marker, position) in seen:
+            raise RuntimeError(f"{marker} item {position} is patched more than once")
+        seen.add((marker, position))
+
+
+def apply_patches(world: WldFile, patches: List[Patch], output: str) -> WldIndex:
+    """Пишет output: неизменённые диапазоны копируются блоками, заменённые элементы —
+    с новым big-endian размером. Возвращает индекс output (сдвинутый, без повторного сканирования)."""
+    check_unique(patches)
+    index = world.index
+    located = sorted(((index.item(m, p)[0], m, p, payload) for m, p, payload in patches), key=lambda t: t[0])
+
+    src_fd = world._file.fileno()
+    total = os.fstat(src_fd).st_size
+    dst_fd = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        pos = 0
+        for offset, marker, position, payload in located:
+            # всё до поля размера элемента (маркер уже скопирован)
+            copy_range(src_fd, dst_fd, pos, offset - 4 - pos)
+            os.write(dst_fd, struct.pack(">I", len(payload)))
+            os.write(dst_fd, payload)
+            pos = offset + index.item(marker, position)[1]
+        copy_range(src_fd, dst_fd, pos, total - pos)
+    finally:
+        os.close(dst_fd)
+
+    return shifted_index(index, located, output)
+
+
+def patch_in_place(world_path: str, index: WldIndex, patches: List[Patch]):
+    """Замены того же размера — просто pwrite поверх старых байтов."""
+    fd = os.open(world_path, os.O_WRONLY)
+    try:
+        for marker, position, payload in patches:
+            os.pwrite(fd, payload, index.item(marker, position)[0])
+    finally:
+        os.close(fd)
+
+
+def shifted_index(index: WldIndex, located: List[Tuple[int, str, int, bytes]], output: str) -> WldIndex:
+    deltas = [(offset, len(payload) - index.item(marker, position)[1]) for offset, marker, position, payload in located]
+    replaced = {(marker, position): payload for _offset, marker, position, payload in located}
+
+    def shift(value: int) -> int:
+        return value + sum(d for offset, d in deltas if offset < value)
+
+    sections: Dict[str, Dict[str, Any]] = {}
+    for marker, sec in index.sections.items():
+        items = []
+        hashes = list(sec['hashes']) if 'hashes' in sec else None
+        for position, item in enumerate(sec['items']):
+            item = [shift(item[0])] + list(item[1:])
+            payload = replaced.get((marker, position))
+            if payload is not None:
+                item[1] = len(payload)
+                if hashes is not None:
+                    hashes[position] = hashlib.blake2b(payload, digest_size=16).hexdigest()
+            items.append(item)
+        start = shift(sec['offset'])
+        end = shift(sec['offset'] + sec['length'])
+        sections[marker] = {'offset': start, 'length': end - start, 'items': items}
+        if hashes is not None:
+            sections[marker]['hashes'] = hashes
+    return WldIndex(sections, source_stamp(output))
+
+
+# ------------------------------ CLI ------------------------------
+
+def parse_assignment(value: str) -> Tuple[str, str]:
+    key, sep, path = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=PATH, got '{value}'")
+    return key, path
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Replace models / texture pages of a WLD without a full repack")
+    parser.add_argument('world', help="path to the .wld file")
+    parser.add_argument('-m', '--model', type=parse_assignment, action='append', default=[],
+                        metavar='ID_OR_NAME=FILE.nmf', help="replacement NMF for a model")
+    parser.add_argument('-p', '--page', type=parse_assignment, action='append', default=[],
+                        metavar='PAGE_ID=FILE.dds', help="replacement pixels for a texture page")
+    parser.add_argument('-o', '--output', help="output .wld (default: patch the world in place)")
+    args = parser.parse_args(argv[1:])
+    if not (args.model or args.page):
+        parser.error("nothing to patch")
+
+    t0 = time.perf_counter()
+    output = args.output or args.world
+    in_place = os.path.abspath(output) == os.path.abspath(args.world)
+    with WldFile(args.world) as world:
+        patches: List[Patch] = []
+        for key, path in args.model:
+            with open(path, 'rb') as io:
+                position, payload = model_payload(world, parse_model_key(key), io.read())
+            patches.append(('LIST', position, payload))
+        for key, path in args.page:
+            position, payload = page_payload(world, int(key), path)
+            patches.append(('TEXP', position, payload))
+        check_unique(patches)
+
+        index = world.index
+        same_size = all(len(payload) == index.item(m, p)[1] for m, p, payload in patches)
+        if in_place and same_size:
+            new_index = None
+        else:
+            new_index = apply_patches(world, patches, output + ".tmp" if in_place else output)
+
+    if new_index is None:
+        patch_in_place(args.world, index, patches)
+        new_index = shifted_index(index, [(index.item(m, p)[0], m, p, payload) for m, p, payload in patches], output)
+    elif in_place:
+        os.replace(output + ".tmp", output)
+        new_index.source = source_stamp(output)
+    try:
+        new_index.save(index_path_for(output))
+    except OSError:
+        pass
+    print(f"Patched {len(patches)} items into {output} in {(time.perf_counter() - t0) * 1000.0:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
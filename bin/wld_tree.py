@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from wld_index import WldIndex, read_cstring
+from wld_models import WldFile, aligned_name_end
+
+# тип элемента дерева мира (см. lib/items/world_items.rb)
+NODE_FOLDER = 0
+NODE_MODEL = 1
+NODE_OBJECT = 2
+NODE_LIGHT = 3
+
+
+def node_id(position: int) -> int:
+    # id узла совпадает с Ruby: индекс в TREE + 2
+    return position + 2
+
+
+def parse_node(data, offset: int) -> Dict[str, Any]:
+    """Заголовок NODE (payload с offset) и начало данных по типу.
+
+    Для моделей возвращает model_id, connections и, если есть SHAD, shad =
+    {size1, size2, offset, length} — смещение и длину байтов карты теней.
+    Для объектов — object_id (INFO не разбирается).
+    """
+    pos = offset + 4  # константа 15
+    parent_id = struct.unpack_from("<i", data, pos)[0]
+    folder_name = read_cstring(data, pos + 4)
+    pos = aligned_name_end(data, pos + 4)
+    x, y, z, w, n, u, unknown1, node_type = struct.unpack_from("<6f2i", data, pos)
+    pos += 32
+    node: Dict[str, Any] = {
+        'parent_id': parent_id, 'folder_name': folder_name,
+        'x': x, 'y': y, 'z': z, 'w': w, 'n': n, 'u': u,
+        'unknown1': unknown1, 'type': node_type,
+    }
+    if node_type == NODE_MODEL:
+        node['model_id'], count = struct.unpack_from("<2i", data, pos)
+        pos += 8
+        node['connections'] = [list(struct.unpack_from("<2i", data, pos + i * 8)) for i in range(max(count, 0))]
+        pos += max(count, 0) * 8 + 4  # + zero
+        if bytes(data[pos:pos + 4]) == b'SHAD':
+            size1, size2 = struct.unpack_from("<2i", data, pos + 4)
+            node['shad'] = {'size1': size1, 'size2': size2, 'offset': pos + 12,
+                            'length': 4 * shadow_words(size1, size2)}
+    elif node_type == NODE_OBJECT:
+        node['object_id'] = struct.unpack_from("<i", data, pos)[0]
+    return node
+
+
+def shadow_words(size1: int, size2: int) -> int:
+    """Число 4-байтовых слов SHAD, как в ShadowsBinaryParser#shadow_size."""
+    additional_offset = 1 if size1 % 2 == 1 and size2 % 2 == 1 else 0
+    return size1 * size2 // 2 + additional_offset
+
+
+def read_tree(world: WldFile) -> List[Dict[str, Any]]:
+    nodes = []
+    for position, (offset, _length) in enumerate(world.index.items('TREE')):
+        node = parse_node(world.data, offset)
+        node['index'] = node_id(position)
+        nodes.append(node)
+    return nodes
+
+
+# ------------------------------ колонки ------------------------------
+
+class TreeArrays:
+    """Дерево мира в виде колонок numpy; строка i — узел с id ids[i].
+
+    model_id / object_id равны -1 у узлов другого типа.
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]]):
+        self.nodes = nodes
+        self.ids = np.array([n['index'] for n in nodes], dtype=np.int32)
+        self.type = np.array([n['type'] for n in nodes], dtype=np.int8)
+        self.parent = np.array([n['parent_id'] for n in nodes], dtype=np.int32)
+        self.positions = np.array([(n['x'], n['y'], n['z']) for n in nodes], dtype=np.float64).reshape(-1, 3)
+        self.model_id = np.array([n.get('model_id', -1) for n in nodes], dtype=np.int32)
+        self.object_id = np.array([n.get('object_id', -1) for n in nodes], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, world: WldFile) -> "TreeArrays":
+        return cls(read_tree(world))
+
+    def row(self, node_index: int) -> int:
+        return node_index - 2
+
+    def with_ancestors(self, rows: np.ndarray) -> np.ndarray:
+        """Строки вместе со всеми родительскими папками — чтобы выборка оставалась деревом."""
+        keep = np.zeros(len(self), dtype=bool)
+        keep[rows] = True
+        frontier = np.unique(self.parent[rows])
+        while frontier.size:
+            parents = frontier - 2
+            parents = parents[(parents >= 0) & (parents < len(self))]
+            parents = parents[~keep[parents]]
+            keep[parents] = True
+            frontier = np.unique(self.parent[parents])
+        return np.flatnonzero(keep)
+
+
+class GridIndex:
+    """Равномерная сетка по позициям узлов для запросов по радиусу и по боксу.
+
+    Точки отсортированы по ключу ячейки; starts/ends дают срез order для каждой
+    непустой ячейки, так что запрос смотрит только ячейки, которые задевает.
+    """
+
+    def __init__(self, positions: np.ndarray, cell_size: float = 10.0):
+        self.positions = positions
+        self.cell_size = float(cell_size)
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        self.origin = cells.min(axis=0) if len(cells) else np.zeros(3, dtype=np.int64)
+        self.dims = (cells.max(axis=0) - self.origin + 1) if len(cells) else np.ones(3, dtype=np.int64)
+        keys = self._keys(cells - self.origin)
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        self.cell_keys, self.starts = np.unique(sorted_keys, return_index=True)
+        self.ends = np.append(self.starts[1:], len(sorted_keys))
+
+    def _keys(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2]
+
+    def _candidates(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        if not len(self.cell_keys):
+            return np.empty(0, dtype=np.int64)
+        c0 = np.maximum(np.floor(lo / self.cell_size).astype(np.int64) - self.origin, 0)
+        c1 = np.minimum(np.floor(hi / self.cell_size).astype(np.int64) - self.origin, self.dims - 1)
+        if np.any(c1 < c0):
+            return np.empty(0, dtype=np.int64)
+        columns = (c1[0] - c0[0] + 1) * (c1[1] - c0[1] + 1)
+        if columns > len(self.cell_keys):
+            # бокс на большую часть мира: дешевле проверить все непустые ячейки
+            keys = self.cell_keys
+            cells = np.stack([keys // (self.dims[1] * self.dims[2]), (keys // self.dims[2]) % self.dims[1],
+                              keys % self.dims[2]], axis=1)
+            slot = np.flatnonzero(np.all((cells >= c0) & (cells <= c1), axis=1))
+        else:
+            # у каждого столбца (x, y) ячейки по z идут подряд — один диапазон ключей на столбец
+            ax, ay = np.arange(c0[0], c1[0] + 1), np.arange(c0[1], c1[1] + 1)
+            base = (ax[:, None] * self.dims[1] + ay[None, :]).reshape(-1) * self.dims[2]
+            first = np.searchsorted(self.cell_keys, base + c0[2], side='left')
+            count = np.searchsorted(self.cell_keys, base + c1[2], side='right') - first
+            slot = np.repeat(first - np.cumsum(count) + count, count) + np.arange(count.sum())
+        if not slot.size:
+            return np.empty(0, dtype=np.int64)
+        starts, lengths = self.starts[slot], self.ends[slot] - self.starts[slot]
+        return self.order[np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())]
+
+    def query_box(self, lo: Sequence[float], hi: Sequence[float]) -> np.ndarray:
+        lo, hi = np.asarray(lo, dtype=np.float64), np.asarray(hi, dtype=np.float64)
+        rows = self._candidates(lo, hi)
+        p = self.positions[rows]
+        return np.sort(rows[np.all((p >= lo) & (p <= hi), axis=1)])
+
+    def query_radius(self, center: Sequence[float], radius: float) -> np.ndarray:
+        center = np.asarray(center, dtype=np.float64)
+        rows = self._candidates(center - radius, center + radius)
+        d = self.positions[rows] - center
+        return np.sort(rows[np.einsum('ij,ij->i', d, d) <= radius * radius])
+
+
+# ------------------------------ CLI ------------------------------
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="World TREE summary and region queries")
+    parser.add_argument('world', help="path to the .wld file")
+    parser.add_argument('--near', nargs=4, type=float, metavar=('X', 'Y', 'Z', 'R'), help="nodes within R of X Y Z")
+    parser.add_argument('--box', nargs=6, type=float, metavar=('X0', 'Y0', 'Z0', 'X1', 'Y1', 'Z1'))
+    parser.add_argument('--cell', type=float, default=10.0, help="grid cell size")
+    parser.add_argument('--export', help="write the selected nodes (with their parent folders) as JSON")
+    args = parser.parse_args(argv[1:])
+
+    t0 = time.perf_counter()
+    with WldFile(args.world, WldIndex.open(args.world)) as world:
+        tree = TreeArrays.load(world)
+    t_load = time.perf_counter()
+    counts = np.bincount(tree.type.clip(0), minlength=4)
+    print(f"{len(tree)} nodes: {counts[NODE_FOLDER]} folders, {counts[NODE_MODEL]} models, "
+          f"{counts[NODE_OBJECT]} objects, {counts[NODE_LIGHT]} lights, "
+          f"{sum(1 for n in tree.nodes if 'shad' in n)} shadow maps ({(t_load - t0) * 1000.0:.1f} ms)")
+
+    if not (args.near or args.box):
+        return 0
+    grid = GridIndex(tree.positions, args.cell)
+    t_query = time.perf_counter()
+    if args.near:
+        rows = grid.query_radius(args.near[:3], args.near[3])
+    else:
+        rows = grid.query_box(args.box[:3], args.box[3:])
+    elapsed = (time.perf_counter() - t_query) * 1e6
+    for r in rows:
+        node = tree.nodes[r]
+        print(f"{node['index']:>7}  type={node['type']}  {node['folder_name']}  "
+              f"({node['x']:.2f}, {node['y']:.2f}, {node['z']:.2f})")
+    print(f"{len(rows)} nodes in {elapsed:.0f} us")
+
+    if args.export:
+        selected = [tree.nodes[r] for r in tree.with_ancestors(rows)]
+        with open(args.export, 'w', encoding='utf-8') as io:
+            json.dump(selected, io, ensure_ascii=False, indent=2)
+        print(f"Wrote {len(selected)} nodes to {args.export}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -14,11 +14,19 @@ bl_info = {
 import bpy
 from bpy.types import Operator
 from bpy_extras.io_utils import ImportHelper
-from bpy.props import StringProperty, BoolProperty
+from bpy.props import StringProperty, BoolProperty, EnumProperty, IntProperty, FloatProperty
 from mathutils import Euler
+from array import array
+from collections import deque
+from contextlib import contextmanager
+import cProfile
+import hashlib
+import json
 import math
+import numpy as np
 import struct
 import os
+import time
 from typing import Any, Dict, List, Optional, Tuple
 
 # ---------------- constants ----------------
@@ -26,6 +34,13 @@ FPS = 24.0
 DEG2RAD = math.pi / 180.0
 RAD2DEG = 180.0 / math.pi
 MATRIX_SIZE = 16
+CACHE_MAGIC = b"NMFC"
+CACHE_FORMAT = 4
+CACHE_EXT = ".nmfcache"
+# значение 'LINEAR' перечисления Keyframe.interpolation для foreach_set
+BEZT_IPO_LIN = 1
+# поля mesh-узла, которые в кэше хранятся сырыми массивами (typecode)
+CACHE_BUFFERS = {'vrts': 'f', 'uvpt': 'f', 'ibuf': 'i', 'edge': 'i', 'face': 'i'}
 
 # ---------------- low-level NMF reader ----------------
 
@@ -279,6 +294,72 @@ class Nmf:
             "unknown_floats3": unknown_floats3,
         }
 
+# ---------------- import statistics ----------------
+
+class ImportStats:
+    """Таймеры по фазам импорта, счётчики и прогресс через window_manager."""
+    PHASES = ('cache', 'parse', 'convert', 'meshes', 'materials', 'animation')
+
+    def __init__(self, window_manager=None):
+        self.wm = window_manager
+        self.timings: Dict[str, float] = {p: 0.0 for p in self.PHASES}
+        self.counters: Dict[str, int] = {
+            'bytes': 0, 'cache_hits': 0, 'nodes': 0, 'vertices': 0, 'keyframes': 0, 'keyframes_removed': 0,
+            'meshes_created': 0, 'meshes_reused': 0,
+            'materials_created': 0, 'materials_reused': 0,
+        }
+        self._step = 0
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def count(self, key: str, n: int = 1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def progress_begin(self, total: int):
+        if self.wm:
+            self.wm.progress_begin(0, max(total, 1))
+        self._step = 0
+
+    def progress_step(self, n: int = 1):
+        self._step += n
+        if self.wm:
+            self.wm.progress_update(self._step)
+
+    def progress_end(self):
+        if self.wm:
+            self.wm.progress_end()
+
+    def summary(self) -> str:
+        c = self.counters
+        total = sum(v for k, v in self.timings.items() if k != 'materials')
+        return (f"{total:.2f}s, {c['nodes']} nodes, {c['vertices']} verts, "
+                f"{c['keyframes']} keys, materials {c['materials_created']} new / {c['materials_reused']} reused")
+
+    def lines(self) -> List[str]:
+        out = ["NMF import statistics", ""]
+        for name, sec in self.timings.items():
+            note = " (incl. in meshes)" if name == 'materials' else ""
+            out.append(f"{name:<12} {sec * 1000.0:10.1f} ms{note}")
+        out.append("")
+        for name, val in self.counters.items():
+            out.append(f"{name:<18} {val}")
+        return out
+
+    def write_text(self, name: str = "NMF_import_stats") -> bpy.types.Text:
+        txt = bpy.data.texts.get(name) or bpy.data.texts.new(name)
+        txt.clear()
+        txt.write("\n".join(self.lines()) + "\n")
+        return txt
+
+def count_keyframes(anim: Dict[str, Any]) -> int:
+    return sum(len(ax.get('frames') or []) for track in anim.values() for ax in track.values())
+
 # ---------------- helpers / geometry ----------------
 
 class MeshGeom:
@@ -367,6 +448,9 @@ def create_transform_chain(node, parent_obj: Optional[bpy.types.Object]):
 
 def convert_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     result = []
+    # joint orient всех суставов модели одним пакетом
+    joints = [n for n in nodes if n["word"] == "JOIN"]
+    orients = dict(zip((n["index"] for n in joints), joint_orients([n["data"] for n in joints])))
     index_map = {n["index"]: n for n in nodes}
     for node in nodes:
         unpacked = node["data"]
@@ -380,7 +464,8 @@ def convert_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if w in ("ROOT", "FRAM"):
             result.append(create_fram(unpacked, node_name=node_name, parent_node_name=parent_name))
         elif w == "JOIN":
-            result.append(create_joint(unpacked, node_name=node_name, parent_node_name=parent_name))
+            result.append(create_joint(unpacked, node_name=node_name, parent_node_name=parent_name,
+                                       joint_orient=orients[node["index"]]))
         elif w == "LOCA":
             result.append(create_locator(unpacked, node_name=node_name, parent_node_name=parent_name))
         elif w == "MESH":
@@ -413,32 +498,99 @@ def animation_build_tracks_by_axis(raw_values: Dict[str, Any]) -> Dict[str, Dict
             result[track] = track_hash
     return result
 
-def extract_3x3(m4: Optional[List[List[float]]]) -> Optional[List[List[float]]]:
-    if not m4:
-        return None
-    a = [c for row in m4 for c in row]
-    return [[a[0], a[1], a[2]],
-            [a[4], a[5], a[6]],
-            [a[8], a[9], a[10]]]
-
-def matrix_rowmajor_to_euler_xyz_standard(m: Optional[List[List[float]]]) -> List[float]:
-    if m is None:
-        return [0.0, 0.0, 0.0]
-    m00, m01, m02 = m[0]
-    m10, m11, m12 = m[1]
-    m20, m21, m22 = m[2]
-    r00, r01, r02 = m00, m10, m20
-    r10, r11, r12 = m01, m11, m21
-    r20, r21, r22 = m02, m12, m22
-    if abs(r20) < 0.999999:
-        y = math.asin(-r20)
-        x = math.atan2(r21, r22)
-        z = math.atan2(r10, r00)
-    else:
-        y = math.asin(-r20)
-        x = math.atan2(-r12, r11)
-        z = 0.0
-    return [x * RAD2DEG, y * RAD2DEG, z * RAD2DEG]
+# допуск по умолчанию: единицы сцены, градусы, множитель масштаба
+KEY_TOLERANCES = {'translation': 0.001, 'rotation': 0.01, 'scaling': 0.001}
+
+def reduce_curve(frames: np.ndarray, values: np.ndarray, tolerance: float) -> np.ndarray:
+    """Маска оставляемых ключей кривой с линейной интерполяцией.
+
+    За проход для каждого внутреннего ключа считается максимальная ошибка всех исходных
+    ключей между его соседями, если его убрать; убираются не соседние друг с другом
+    ключи с ошибкой <= tolerance. Проходы повторяются, пока есть что убрать.
+    """
+    n = len(frames)
+    keep = np.ones(n, dtype=bool)
+    if n <= 2:
+        return keep
+    while True:
+        kept = np.flatnonzero(keep)
+        if len(kept) <= 2:
+            return keep
+        prev, nxt = kept[:-2], kept[2:]
+        # все исходные ключи в окнах [prev, next] одним массивом
+        lengths = nxt - prev + 1
+        window = np.repeat(np.arange(len(prev)), lengths)
+        sample = np.repeat(prev - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        f0, f1 = frames[prev][window], frames[nxt][window]
+        v0, v1 = values[prev][window], values[nxt][window]
+        span = np.where(f1 > f0, f1 - f0, 1.0)
+        fitted = v0 + (v1 - v0) * (frames[sample] - f0) / span
+        error = np.maximum.reduceat(np.abs(values[sample] - fitted), np.cumsum(lengths) - lengths)
+        removable = error <= tolerance
+        if not removable.any():
+            return keep
+        # из подряд идущих кандидатов берём каждый второй, чтобы окна не пересекались
+        run_start = np.maximum.accumulate(np.where(~removable, np.arange(len(removable)), -1))
+        chosen = removable & ((np.arange(len(removable)) - run_start) % 2 == 1)
+        keep[kept[1:-1][chosen]] = False
+
+def reduce_keyframes(nodes: List[Dict[str, Any]], tolerances: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Сокращение ключей анимации узлов (на месте).
+
+    Постоянный канал удаляется целиком, а его значение становится статическим значением
+    атрибута узла; у остальных убираются ключи, лежащие на прямой в пределах допуска.
+    """
+    tolerances = {**KEY_TOLERANCES, **(tolerances or {})}
+    report = {'keys_before': 0, 'keys_after': 0, 'channels_dropped': 0}
+    for node in nodes:
+        anim = node.get('animations')
+        if not anim:
+            continue
+        for track in list(anim.keys()):
+            tol = tolerances[track]
+            for ax in list(anim[track].keys()):
+                curve = anim[track][ax]
+                frames = np.asarray(curve['frames'], dtype=np.float64)
+                values = np.asarray(curve['values'], dtype=np.float64)
+                report['keys_before'] += len(frames)
+                if len(values) and np.ptp(values) <= tol:
+                    node[track] = list(node[track])
+                    node[track]['xyz'.index(ax)] = float(values[0])
+                    del anim[track][ax]
+                    report['channels_dropped'] += 1
+                    continue
+                keep = reduce_curve(frames, values, tol)
+                curve['frames'] = frames[keep].tolist()
+                curve['values'] = values[keep].tolist()
+                report['keys_after'] += int(keep.sum())
+            if not anim[track]:
+                del anim[track]
+        node['with_animation'] = bool(anim)
+    return report
+
+def matrices_rowmajor_to_euler_xyz(matrices) -> np.ndarray:
+    """(n, 4, 4) матрицы (вектор-строка) → (n, 3) углы XYZ в градусах.
+
+    Раскладывается транспонированная 3x3: rij = m[j][i], как в Ruby-конвертере;
+    при |r20| ~ 1 (gimbal lock) z = 0.
+    """
+    m = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    r20 = m[:, 0, 2]
+    regular = np.abs(r20) < 0.999999
+    y = np.arcsin(np.clip(-r20, -1.0, 1.0))
+    # вне gimbal: x = atan2(r21, r22), z = atan2(r10, r00); иначе x = atan2(-r12, r11), z = 0
+    x = np.where(regular, np.arctan2(m[:, 1, 2], m[:, 2, 2]), np.arctan2(-m[:, 2, 1], m[:, 1, 1]))
+    z = np.where(regular, np.arctan2(m[:, 0, 1], m[:, 0, 0]), 0.0)
+    return np.stack([x, y, z], axis=1) * RAD2DEG
+
+def joint_orients(joints: List[Dict[str, Any]]) -> List[List[float]]:
+    """joint orient (градусы) для данных нескольких JOIN одним пакетом; без rotation_matrix — нули."""
+    out = [[0.0, 0.0, 0.0] for _ in joints]
+    with_matrix = [i for i, data in enumerate(joints) if data.get('rotation_matrix')]
+    angles = matrices_rowmajor_to_euler_xyz([joints[i]['rotation_matrix'] for i in with_matrix])
+    for i, orient in zip(with_matrix, angles.tolist()):
+        out[i] = orient
+    return out
 
 def build_edges_and_faces_signed(tris: List[List[int]]) -> Tuple[List[List[int]], List[List[int]]]:
     edge_map: Dict[str, int] = {}
@@ -500,7 +652,8 @@ def create_fram(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], n
     result['animations'] = anim
     return result
 
-def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], node_name: str) -> Dict[str, Any]:
+def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str], node_name: str,
+                 joint_orient: Optional[List[float]] = None) -> Dict[str, Any]:
     result: Dict[str, Any] = {}
     result['node_name'] = node_name
     result['parent_node_name'] = parent_node_name
@@ -512,8 +665,9 @@ def create_joint(fram_data: Dict[str, Any], *, parent_node_name: Optional[str],
     result['rotation_matrix'] = fram_data['rotation_matrix']
     result['min_rot_limit'] = fram_data['min_rot_limit']
     result['max_rot_limit'] = fram_data['max_rot_limit']
-    m3 = extract_3x3(result['rotation_matrix'])
-    result['joint_orient'] = matrix_rowmajor_to_euler_xyz_standard(m3)  # градусы
+    if joint_orient is None:
+        joint_orient = joint_orients([fram_data])[0]
+    result['joint_orient'] = joint_orient  # градусы
 
     # имена контроллеров цепочки joint
     base = node_name
@@ -556,6 +710,40 @@ def create_joint_chain(node, parent_obj: Optional[bpy.types.Object]):
 def create_locator(_: Dict[str, Any], *, node_name: str, parent_node_name: Optional[str]) -> Dict[str, Any]:
     return {'node_type': 'locator', 'node_name': node_name, 'parent_node_name': parent_node_name}
 
+def decode_mesh_anim_frames(blocks: List[Dict[str, Any]],
+                            vrts: List[List[float]]) -> Optional[Tuple[List[float], List[List[float]]]]:
+    """Per-mesh ANIM → (кадры, позиции вершин на каждый кадр).
+
+    Формат блока не известен; это догадка: unknown_ints — индексы анимируемых вершин,
+    unknown_floats1/2/3 — кривые смещения по X/Y/Z (s ключей времени, затем s значений,
+    как в ANIM узлов). Поэтому включается только опцией импорта.
+    """
+    if not blocks:
+        return None
+    base = np.asarray(vrts, dtype=np.float64).reshape(-1, 3)
+
+    tracks = []
+    for b in blocks:
+        idx = np.asarray(b['unknown_ints'], dtype=np.int64)
+        idx = np.unique(idx[(idx >= 0) & (idx < len(base))])
+        if idx.size == 0:
+            continue
+        for axis, n in enumerate((b['unknown_size1'], b['unknown_size2'], b['unknown_size3'])):
+            if n <= 0:
+                continue
+            data = np.asarray(b[f'unknown_floats{axis + 1}'], dtype=np.float64)
+            keys, values = data[:n], data[n:2 * n]
+            order = np.argsort(keys, kind='stable')
+            tracks.append((idx, axis, keys[order], values[order]))
+    if not tracks:
+        return None
+
+    times = np.unique(np.concatenate([t[2] for t in tracks]))
+    coords = np.repeat(base[None, :, :], len(times), axis=0)
+    for idx, axis, keys, values in tracks:
+        coords[:, idx, axis] += np.interp(times, keys, values)[:, None]
+    return (times * FPS).tolist(), coords.reshape(len(times), -1).tolist()
+
 def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name: Optional[str]) -> Dict[str, Any]:
     result: Dict[str, Any] = {'node_type': 'mesh'}
     result['node_name'] = node_name
@@ -605,6 +793,10 @@ def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name:
             'tex_path': tex_path,
             'has_tex': bool(tex_path),
         })
+        tex = m.get('texture')
+        if isinstance(tex, dict) and 'texture_page' in tex:
+            materials_out[-1]['page_id'] = int(tex['texture_page'])
+            materials_out[-1]['page_rect'] = [tex['x0'], tex['y0'], tex['x2'], tex['y2']]
     if not materials_out:
         materials_out.append({
             'mat_name': f"lambert_{result['node_name']}",
@@ -613,8 +805,230 @@ def create_mesh(mesh_data: Dict[str, Any], *, node_name: str, parent_node_name:
             'tex_path': None, 'has_tex': False,
         })
     result['materials'] = materials_out
+
+    # сырой per-mesh ANIM: shape keys из него строятся только по опции импорта
+    if mesh_data.get('mesh_anim'):
+        result['mesh_anim'] = mesh_data['mesh_anim']
     return result
 
+def apply_mesh_shape_frames(nodes: List[Dict[str, Any]]) -> int:
+    """shape_frames/shape_coords для mesh-узлов с per-mesh ANIM; возвращает число таких мешей."""
+    count = 0
+    for node in nodes:
+        if node.get('node_type') != 'mesh':
+            continue
+        shape = decode_mesh_anim_frames(node.get('mesh_anim'), node['vrts'])
+        if shape:
+            node['shape_frames'], node['shape_coords'] = shape
+            count += 1
+    return count
+
+# ---------------- texture page (atlas) binding ----------------
+
+PAGE_IMAGE_EXTS = ('.png', '.dds')
+
+def find_texture_page(pages_dir: str, page_id: int) -> Optional[str]:
+    for ext in PAGE_IMAGE_EXTS:
+        path = os.path.join(pages_dir, f"{page_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def texture_page_size(path: str) -> Tuple[int, int]:
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if head[:4] == b'DDS ':
+        height, width = struct.unpack_from("<2I", head, 12)
+    elif head[:8] == b'\x89PNG\r\n\x1a\n':
+        width, height = struct.unpack_from(">2I", head, 16)
+    else:
+        raise RuntimeError(f"Unsupported texture page image: {path}")
+    return width, height
+
+def page_binding(materials: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Материал, по которому меш переносится на страницу целиком, или (None, причина).
+
+    Назначения материалов по граням в NMF нет: UV меша одни на все материалы. Поэтому
+    перепривязка возможна, только если все материалы меша ссылаются на один и тот же
+    прямоугольник одной страницы с одинаковым отражением и без поворота UV.
+    """
+    paged = [m for m in materials if 'page_id' in m]
+    if not paged:
+        return None, None
+    first = paged[0]
+    if len(paged) != len(materials):
+        return None, "has materials without a texture page"
+    layout = (first['page_id'], list(first['page_rect']), first['mirrorU'], first['mirrorV'])
+    if any((m['page_id'], list(m['page_rect']), m['mirrorU'], m['mirrorV']) != layout for m in paged[1:]):
+        return None, "materials use different texture page rectangles"
+    if any(m['rotateUV'] for m in paged):
+        return None, "rotated texture (rotateUV) is not supported"
+    return first, None
+
+def apply_atlas_binding(nodes: List[Dict[str, Any]], pages_dir: str) -> Tuple[int, List[Tuple[str, str]]]:
+    """Перепривязка текстур к целым страницам TEXP.
+
+    UV меша переносятся в прямоугольник x0/y0/x2/y2 его материала (page_binding),
+    а материалы меша заменяются одним общим материалом этой страницы.
+    Возвращает (число перепривязанных мешей, [(меш, причина пропуска)]).
+    """
+    pages: Dict[int, Optional[Tuple[str, int, int]]] = {}
+    bound = 0
+    skipped: List[Tuple[str, str]] = []
+    for node in nodes:
+        if node.get('node_type') != 'mesh':
+            continue
+        mdef, reason = page_binding(node['materials'])
+        if reason:
+            skipped.append((node['node_name'], reason))
+        if mdef is None:
+            continue
+        page_id = mdef['page_id']
+        if page_id not in pages:
+            path = find_texture_page(pages_dir, page_id)
+            pages[page_id] = (path, *texture_page_size(path)) if path else None
+        page = pages[page_id]
+        if page is None:
+            skipped.append((node['node_name'], f"texture page {page_id} not found"))
+            continue
+        path, width, height = page
+
+        x0, y0, x2, y2 = mdef['page_rect']
+        flip_u, flip_v = mdef['mirrorU'] != 0, mdef['mirrorV'] != 0
+        uvpt = []
+        for u, v in node['uvpt']:
+            if flip_u:
+                u = 1.0 - u
+            if flip_v:
+                v = 1.0 - v
+            uvpt.append([(x0 + u * (x2 - x0)) / width, (y0 + v * (y2 - y0)) / height])
+        node['uvpt'] = uvpt
+        node['materials'] = [{
+            'mat_name': f"NMF_Page_{page_id}",
+            'r': 1.0, 'g': 1.0, 'b': 1.0, 'a': 0.0,
+            'repeatU': 1.0, 'repeatV': 1.0, 'mirrorU': 0, 'mirrorV': 0, 'rotateUV': 0.0,
+            'tex_path': os.path.abspath(path), 'has_tex': True, 'shared': True, 'page_id': page_id,
+        }]
+        bound += 1
+    return bound, skipped
+
+# ---------------- converted-node cache ----------------
+
+def cache_key(nmf_path: str) -> Dict[str, Any]:
+    st = os.stat(nmf_path)
+    return {
+        'path': os.path.abspath(nmf_path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'version': list(bl_info['version']),
+        'format': CACHE_FORMAT,
+    }
+
+def cache_file_path(nmf_path: str, cache_dir: Optional[str]) -> str:
+    # cache_dir is None → кэш лежит рядом с .nmf
+    if cache_dir is None:
+        return nmf_path + CACHE_EXT
+    digest = hashlib.blake2b(os.path.abspath(nmf_path).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, digest + CACHE_EXT)
+
+def save_nodes_cache(cache_path: str, key: Dict[str, Any], nodes: List[Dict[str, Any]]):
+    header_nodes = []
+    blobs: List[bytes] = []
+    for node in nodes:
+        out = dict(node)
+        if node.get('node_type') == 'mesh':
+            for field, code in CACHE_BUFFERS.items():
+                if field not in node:
+                    continue
+                width = len(node[field][0]) if node[field] else 0
+                flat = array(code, [c for row in node[field] for c in row])
+                out[field] = {'buf': len(blobs), 'type': code, 'width': width}
+                blobs.append(flat.tobytes())
+        header_nodes.append(out)
+
+    header = json.dumps({'key': key, 'nodes': header_nodes, 'sizes': [len(b) for b in blobs]}).encode('utf-8')
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(struct.pack("<II", CACHE_FORMAT, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, cache_path)
+
+def load_nodes_cache(cache_path: str, key: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # любой короткий или испорченный файл (оборванная запись и т.п.) — промах кэша
+    if len(data) < 12 or data[:4] != CACHE_MAGIC:
+        return None
+    fmt, header_len = struct.unpack_from("<II", data, 4)
+    if fmt != CACHE_FORMAT or 12 + header_len > len(data):
+        return None
+    pos = 12 + header_len
+    try:
+        header = json.loads(data[12:pos].decode('utf-8'))
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get('key') != key:
+        return None
+
+    try:
+        offsets = []
+        for size in header['sizes']:
+            offsets.append((pos, size))
+            pos += size
+        if pos != len(data):
+            return None
+
+        view = memoryview(data)
+        nodes = header['nodes']
+        for node in nodes:
+            for field in CACHE_BUFFERS:
+                ref = node.get(field)
+                if not isinstance(ref, dict):
+                    continue
+                start, size = offsets[ref['buf']]
+                flat = array(ref['type'])
+                flat.frombytes(view[start:start + size])
+                node[field] = [list(row) for row in zip(*[iter(flat)] * ref['width'])]
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        return None
+
+    # LRU: свежесть файла = время последнего попадания
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return nodes
+
+def evict_cache(cache_dir: str, max_bytes: int):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CACHE_EXT):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(e[1] for e in entries)
+    for _mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def user_cache_dir() -> str:
+    return bpy.utils.user_resource('DATAFILES', path="nmf_import_cache", create=True)
+
 # ---------------- Blender building ----------------
 
 def ensure_collection(name: str) -> bpy.types.Collection:
@@ -658,7 +1072,18 @@ def create_transform_with_pivot(node, parent_obj: Optional[bpy.types.Object]):
                          type=('ARROWS' if node['node_type'] == 'joint' else 'PLAIN_AXES'))
     return pivot, child
 
-def create_mesh_object(node: Dict[str, Any], parent: Optional[bpy.types.Object]) -> bpy.types.Object:
+def mesh_content_key(node: Dict[str, Any]) -> str:
+    # одинаковые вершины/индексы/UV и набор материалов → один и тот же mesh datablock
+    h = hashlib.blake2b(digest_size=16)
+    h.update(array('f', [c for v in node['vrts'] for c in v]).tobytes())
+    h.update(array('i', [i for t in node['ibuf'] for i in t]).tobytes())
+    h.update(array('f', [c for uv in node.get('uvpt', []) for c in uv]).tobytes())
+    for m in node.get('materials', []):
+        # имя материала содержит имя узла, поэтому в ключ не входит
+        h.update(repr(sorted((k, v) for k, v in m.items() if k != 'mat_name')).encode('utf-8'))
+    return h.hexdigest()
+
+def build_mesh_data(node: Dict[str, Any], stats: Optional[ImportStats] = None) -> bpy.types.Mesh:
     name = node['node_name']
     verts = [tuple(v) for v in node['vrts']]
     faces = [tuple(t) for t in node['ibuf']]
@@ -682,9 +1107,60 @@ def create_mesh_object(node: Dict[str, Any], parent: Optional[bpy.types.Object])
 
     # Materials
     for m in node.get('materials', []):
-        mat = build_material(m)
+        # материалы страниц (atlas) общие для всех мешей
+        mat = find_page_material(m) if m.get('shared') else None
+        if mat is not None:
+            if stats:
+                stats.count('materials_reused')
+        elif stats:
+            with stats.phase('materials'):
+                mat = build_material(m)
+            stats.count('materials_created')
+        else:
+            mat = build_material(m)
+        if mat is not None and m.get('shared'):
+            mat['nmf_page_path'] = m['tex_path']
         if mat and mat.name not in [x.name for x in me.materials]:
             me.materials.append(mat)
+    return me
+
+def find_page_material(mdef: Dict[str, Any]) -> Optional[bpy.types.Material]:
+    """Общий материал страницы: то же имя NMF_Page_<id> и тот же файл страницы.
+
+    Страницы с одним id из разных каталогов — разные материалы (второй получит суффикс .001).
+    """
+    path = mdef['tex_path']
+    mat = bpy.data.materials.get(mdef['mat_name'])
+    if mat is not None and mat.get('nmf_page_path') == path:
+        return mat
+    return next((x for x in bpy.data.materials if x.get('nmf_page_path') == path), None)
+
+def obtain_mesh_data(node: Dict[str, Any], mesh_cache: Optional[Dict[str, bpy.types.Mesh]] = None,
+                     stats: Optional[ImportStats] = None) -> bpy.types.Mesh:
+    # mesh_cache is None → каждый объект получает собственный меш;
+    # shape keys живут в меше, поэтому анимированные меши не разделяются
+    key = None
+    me = None
+    if mesh_cache is not None and not node.get('shape_frames'):
+        key = mesh_content_key(node)
+        me = mesh_cache.get(key)
+    if me is None:
+        me = build_mesh_data(node, stats)
+        if key is not None:
+            mesh_cache[key] = me
+        if stats:
+            stats.count('meshes_created')
+            stats.count('vertices', len(node['vrts']))
+    elif stats:
+        stats.count('meshes_reused')
+        stats.count('materials_reused', len(me.materials))
+    return me
+
+def create_mesh_object(node: Dict[str, Any], parent: Optional[bpy.types.Object],
+                       mesh_cache: Optional[Dict[str, bpy.types.Mesh]] = None,
+                       stats: Optional[ImportStats] = None) -> bpy.types.Object:
+    name = node['node_name']
+    me = obtain_mesh_data(node, mesh_cache, stats)
 
     obj = bpy.data.objects.new(name, me)
     if parent:
@@ -692,6 +1168,75 @@ def create_mesh_object(node: Dict[str, Any], parent: Optional[bpy.types.Object])
     bpy.context.collection.objects.link(obj)
     return obj
 
+def apply_shape_key_animation(obj: bpy.types.Object, node: Dict[str, Any], stats: Optional[ImportStats] = None):
+    frames = node.get('shape_frames')
+    coords = node.get('shape_coords')
+    if not frames or not coords:
+        return
+    stats = stats or ImportStats()
+    with stats.phase('animation'):
+        if obj.data.shape_keys is None:
+            obj.shape_key_add(name="Basis", from_mix=False)
+        names = []
+        for i, co in enumerate(coords):
+            kb = obj.shape_key_add(name=f"Frame_{i:04d}", from_mix=False)
+            kb.data.foreach_set("co", co)
+            names.append(kb.name)
+
+        key = obj.data.shape_keys
+        ad = key.animation_data or key.animation_data_create()
+        action = bpy.data.actions.new(f"{obj.name}_ShapeKeys")
+        ad.action = action
+        last = len(frames) - 1
+        for i, kb_name in enumerate(names):
+            # ключ = 1 на своём кадре и 0 на соседних
+            pts: List[float] = []
+            if i > 0:
+                pts += [frames[i - 1], 0.0]
+            pts += [frames[i], 1.0]
+            if i < last:
+                pts += [frames[i + 1], 0.0]
+            fc = action.fcurves.new(data_path=f'key_blocks["{kb_name}"].value')
+            fc.keyframe_points.add(len(pts) // 2)
+            fc.keyframe_points.foreach_set("co", pts)
+            fc.keyframe_points.foreach_set("interpolation", [BEZT_IPO_LIN] * (len(pts) // 2))
+            fc.update()
+            stats.count('keyframes', len(pts) // 2)
+
+BOX_EDGES = ((0, 1), (1, 3), (3, 2), (2, 0), (4, 5), (5, 7), (7, 6), (6, 4), (0, 4), (1, 5), (2, 6), (3, 7))
+
+def create_proxy_object(node: Dict[str, Any], parent: Optional[bpy.types.Object]) -> bpy.types.Object:
+    # каркасный bounding box по позициям из vbuf, пока настоящий меш не построен
+    vrts = node['vrts']
+    if vrts:
+        lo = [min(v[i] for v in vrts) for i in range(3)]
+        hi = [max(v[i] for v in vrts) for i in range(3)]
+    else:
+        lo = hi = [0.0, 0.0, 0.0]
+    corners = [(x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])]
+
+    me = bpy.data.meshes.new(node['node_name'] + "_Proxy")
+    me.from_pydata(corners, BOX_EDGES, [])
+    obj = bpy.data.objects.new(node['node_name'], me)
+    obj.display_type = 'WIRE'
+    if parent:
+        obj.parent = parent
+    bpy.context.collection.objects.link(obj)
+    return obj
+
+def swap_proxy_mesh(obj: bpy.types.Object, node: Dict[str, Any],
+                    mesh_cache: Optional[Dict[str, bpy.types.Mesh]], stats: ImportStats):
+    try:
+        proxy = obj.data
+    except ReferenceError:
+        return  # объект удалили, пока шла загрузка
+    with stats.phase('meshes'):
+        obj.data = obtain_mesh_data(node, mesh_cache, stats)
+        obj.display_type = 'TEXTURED'
+        if proxy.users == 0:
+            bpy.data.meshes.remove(proxy)
+    apply_shape_key_animation(obj, node, stats)
+
 def build_material(mdef: Dict[str, Any]) -> Optional[bpy.types.Material]:
     mat = bpy.data.materials.new(mdef['mat_name'])
     mat.use_nodes = True
@@ -719,7 +1264,7 @@ def build_material(mdef: Dict[str, Any]) -> Optional[bpy.types.Material]:
         img_path = mdef.get('tex_path') or ""
         try:
             # If relative, try relative to current blend or to the nmf
-            tex_img.image = bpy.data.images.load(img_path)
+            tex_img.image = bpy.data.images.load(img_path, check_existing=True)
         except Exception:
             # leave empty image slot
             pass
@@ -807,9 +1352,59 @@ def apply_node_animation_split(chain: Dict[str, bpy.types.Object], anim: Dict[st
         apply_node_animation_component(s_target, {'scaling': anim['scaling']})
 
 
-def build_scene_from_nodes(nodes: List[Dict[str, Any]]):
+def apply_node_animation_task(node: Dict[str, Any], ctrls: Dict[str, Dict[str, bpy.types.Object]],
+                              name_to_obj: Dict[str, bpy.types.Object], stats: ImportStats):
+    anim = node.get('animations', {})
+    stats.count('keyframes', count_keyframes(anim))
+    with stats.phase('animation'):
+        ch = ctrls.get(node['node_name'])
+        if ch:
+            apply_node_animation_split(ch, anim)
+        else:
+            # на всякий случай для старых узлов без цепочки
+            obj = name_to_obj.get(node['node_name'])
+            if obj:
+                apply_node_animation(obj, anim)
+
+class ProgressiveBuilder:
+    """Отложенные задачи прогрессивного импорта порциями не дольше budget секунд.
+
+    Порции выполняет модальный IMPORT_OT_nmf по событиям таймера; исключение задачи
+    не глотается — оператор останавливает таймер и сообщает об ошибке.
+    Каждая выполненная задача — шаг прогресса (задачи входят в total progress_begin).
+    """
+
+    def __init__(self, tasks, budget: float, stats: Optional[ImportStats] = None):
+        self.tasks = deque(tasks)
+        self.budget = budget
+        self.total = len(self.tasks)
+        self.stats = stats
+
+    def run(self) -> bool:
+        """Одна порция; True, когда задач не осталось."""
+        deadline = time.perf_counter() + self.budget
+        while self.tasks and time.perf_counter() < deadline:
+            self.tasks[0]()
+            self.tasks.popleft()
+            if self.stats:
+                self.stats.progress_step()
+        return not self.tasks
+
+def count_deferred(nodes: List[Dict[str, Any]]) -> int:
+    """Сколько задач вернёт build_scene_from_nodes(progressive=True): замена прокси и анимация."""
+    return sum((n['node_type'] == 'mesh') + bool(n.get('with_animation')) for n in nodes)
+
+def build_scene_from_nodes(nodes: List[Dict[str, Any]], share_meshes: bool = True,
+                           stats: Optional[ImportStats] = None,
+                           progressive: bool = False) -> List[Any]:
+    # progressive → меши создаются как bounding-box прокси; возвращаются
+    # отложенные задачи (замена геометрии, анимация) для ProgressiveBuilder
     name_to_obj: Dict[str, bpy.types.Object] = {}
     ctrls: Dict[str, Dict[str, bpy.types.Object]] = {}
+    # меши делятся только внутри одного импорта: старые могли быть изменены вручную
+    mesh_cache: Optional[Dict[str, bpy.types.Mesh]] = {} if share_meshes else None
+    stats = stats or ImportStats()
+    deferred: List[Any] = []
 
     # Запомним, кто кому должен быть родителем (по именам), чтобы допривязать позже
     pending_parent: List[Tuple[str, str]] = []  # (child_root_name, parent_anchor_name)
@@ -837,11 +1432,19 @@ def build_scene_from_nodes(nodes: List[Dict[str, Any]]):
                 pending_parent.append((chain['T'].name, parent_name))
 
         elif nt == 'mesh':
-            obj = create_mesh_object(node, parent_obj)
+            if progressive:
+                obj = create_proxy_object(node, parent_obj)
+                deferred.append(lambda obj=obj, node=node: swap_proxy_mesh(obj, node, mesh_cache, stats))
+            else:
+                with stats.phase('meshes'):
+                    obj = create_mesh_object(node, parent_obj, mesh_cache, stats)
+                apply_shape_key_animation(obj, node, stats)
             name_to_obj[node['node_name']] = obj
             if parent_name and parent_obj is None:
                 pending_mesh_parent.append((obj.name, parent_name))
 
+        stats.progress_step()
+
     # 2) второй проход — выставляем родителей, когда они уже созданы
     for child_root_name, parent_anchor_name in pending_parent:
         parent_anchor = name_to_obj.get(parent_anchor_name)
@@ -857,17 +1460,14 @@ def build_scene_from_nodes(nodes: List[Dict[str, Any]]):
 
     # 3) Анимация — после того, как иерархия корректна
     for node in nodes:
+        stats.progress_step()
         if not node.get('with_animation'):
             continue
-        anim = node.get('animations', {})
-        ch = ctrls.get(node['node_name'])
-        if ch:
-            apply_node_animation_split(ch, anim)
+        if progressive:
+            deferred.append(lambda node=node: apply_node_animation_task(node, ctrls, name_to_obj, stats))
         else:
-            # на всякий случай для старых узлов без цепочки
-            obj = name_to_obj.get(node['node_name'])
-            if obj:
-                apply_node_animation(obj, anim)
+            apply_node_animation_task(node, ctrls, name_to_obj, stats)
+    return deferred
 
 # ---------------- glue: import operator ----------------
 
@@ -883,32 +1483,223 @@ class IMPORT_OT_nmf(Operator, ImportHelper):
         default=True,
         description="Create a new collection named after the file"
     )
+    share_meshes: BoolProperty(
+        name="Share Identical Meshes",
+        default=True,
+        description="Link objects of this import with identical geometry and materials to one mesh datablock"
+    )
+    write_stats_text: BoolProperty(
+        name="Write Import Statistics",
+        default=False,
+        description="Store per-phase timings and counters in the 'NMF_import_stats' text datablock"
+    )
+    use_cache: BoolProperty(
+        name="Cache Parsed Model",
+        default=False,
+        description="Reuse converted nodes from a cache file when the .nmf has not changed"
+    )
+    cache_location: EnumProperty(
+        name="Cache Location",
+        items=(
+            ('USER', "User Cache", "Store cache files in Blender's user data directory"),
+            ('SIDECAR', "Next to File", "Store the cache file next to the .nmf"),
+        ),
+        default='USER',
+    )
+    cache_size_mb: IntProperty(
+        name="Cache Size (MB)",
+        default=512,
+        min=1,
+        description="Least recently used entries of the user cache are removed above this size"
+    )
+    progressive: BoolProperty(
+        name="Progressive Import",
+        default=False,
+        description="Create the hierarchy with bounding-box proxies first and stream geometry, "
+                    "materials and animation in afterwards"
+    )
+    tick_budget_ms: IntProperty(
+        name="Time per Tick (ms)",
+        default=20,
+        min=1,
+        description="Maximum time a progressive import spends per timer tick"
+    )
+    texture_binding: EnumProperty(
+        name="Textures",
+        items=(
+            ('FILE', "Source Files", "Load each material's original texture file"),
+            ('ATLAS', "Texture Pages", "Load each TEXP page once and remap UVs into the page rectangle"),
+        ),
+        default='FILE',
+    )
+    texture_pages_dir: StringProperty(
+        name="Texture Pages Folder",
+        default="",
+        subtype='DIR_PATH',
+        description="Folder with <page id>.png/.dds page images (default: next to the .nmf)"
+    )
+    reduce_keys: BoolProperty(
+        name="Reduce Keyframes",
+        default=False,
+        description="Drop constant animation channels and keys that lie on a line within the tolerance"
+    )
+    key_tolerance_location: FloatProperty(
+        name="Location Tolerance",
+        default=KEY_TOLERANCES['translation'],
+        min=0.0,
+        precision=4,
+    )
+    key_tolerance_rotation: FloatProperty(
+        name="Rotation Tolerance (deg)",
+        default=KEY_TOLERANCES['rotation'],
+        min=0.0,
+        precision=4,
+    )
+    key_tolerance_scale: FloatProperty(
+        name="Scale Tolerance",
+        default=KEY_TOLERANCES['scaling'],
+        min=0.0,
+        precision=4,
+    )
+    mesh_shape_keys: BoolProperty(
+        name="Mesh Animation as Shape Keys (Experimental)",
+        default=False,
+        description="Guess vertex animation from per-mesh ANIM blocks (format unknown) and build "
+                    "shape keys; such meshes are never shared"
+    )
+    profile_path: StringProperty(
+        name="cProfile Output",
+        default="",
+        subtype='FILE_PATH',
+        description="If set, run the import under cProfile and dump the stats to this file"
+    )
 
     def execute(self, context):
-        nmf_path = self.filepath
+        self._stats = ImportStats(context.window_manager)
+        self._profiler = cProfile.Profile() if self.profile_path else None
         try:
-            parser = Nmf()
-            nodes_raw = parser.unpack(nmf_path)
-            nodes = convert_nodes(nodes_raw)
-
-            # optional collection
-            target_layer = context.collection
-            if self.create_collection:
-                base = os.path.splitext(os.path.basename(nmf_path))[0]
-                col = ensure_collection(f"NMF_{base}")
-                # switch active collection to it during import
-                with context.temp_override(collection=col):
-                    build_scene_from_nodes(nodes)
-            else:
-                build_scene_from_nodes(nodes)
-
+            with self.profiled():
+                deferred = self.import_file(context, self._stats)
         except Exception as e:
+            self.finish_import()
             self.report({'ERROR'}, f"NMF import failed: {e}")
             return {'CANCELLED'}
 
-        self.report({'INFO'}, "NMF import finished")
+        if deferred:
+            # статистика и профиль закрываются в modal(), когда достроена вся сцена
+            self._builder = ProgressiveBuilder(deferred, self.tick_budget_ms / 1000.0, self._stats)
+            wm = context.window_manager
+            self._timer = wm.event_timer_add(0.01, window=context.window)
+            wm.modal_handler_add(self)
+            self.report({'INFO'}, "NMF hierarchy created, streaming geometry in")
+            return {'RUNNING_MODAL'}
+        self.finish_import()
+        self.report({'INFO'}, f"NMF import finished: {self._stats.summary()}")
         return {'FINISHED'}
 
+    def modal(self, context, event):
+        if event.type != 'TIMER' or event.timer != self._timer:
+            return {'PASS_THROUGH'}
+        try:
+            with self.profiled():
+                done = self._builder.run()
+        except Exception as e:
+            context.window_manager.event_timer_remove(self._timer)
+            self.finish_import()
+            self.report({'ERROR'}, f"NMF progressive import failed: {e} "
+                                   f"({len(self._builder.tasks)} of {self._builder.total} steps not built)")
+            return {'CANCELLED'}
+        if not done:
+            return {'PASS_THROUGH'}
+        context.window_manager.event_timer_remove(self._timer)
+        self.finish_import()
+        self.report({'INFO'}, f"NMF import finished: {self._stats.summary()}")
+        return {'FINISHED'}
+
+    @contextmanager
+    def profiled(self):
+        # профиль копится по всем порциям, без простоя между тиками таймера
+        if self._profiler:
+            self._profiler.enable()
+        try:
+            yield
+        finally:
+            if self._profiler:
+                self._profiler.disable()
+
+    def finish_import(self):
+        self._stats.progress_end()
+        if self._profiler:
+            self._profiler.dump_stats(bpy.path.abspath(self.profile_path))
+        if self.write_stats_text:
+            self._stats.write_text()
+
+    def load_nodes(self, nmf_path: str, stats: ImportStats) -> List[Dict[str, Any]]:
+        cache_dir = None
+        cache_path = None
+        if self.use_cache:
+            cache_dir = user_cache_dir() if self.cache_location == 'USER' else None
+            cache_path = cache_file_path(nmf_path, cache_dir)
+            key = cache_key(nmf_path)
+            with stats.phase('cache'):
+                nodes = load_nodes_cache(cache_path, key)
+            if nodes is not None:
+                stats.count('cache_hits')
+                return nodes
+
+        stats.count('bytes', os.path.getsize(nmf_path))
+        with stats.phase('parse'):
+            parser = Nmf()
+            nodes_raw = parser.unpack(nmf_path)
+        with stats.phase('convert'):
+            nodes = convert_nodes(nodes_raw)
+
+        if cache_path:
+            with stats.phase('cache'):
+                try:
+                    save_nodes_cache(cache_path, key, nodes)
+                    if cache_dir:
+                        evict_cache(cache_dir, self.cache_size_mb * 1024 * 1024)
+                except OSError as e:
+                    self.report({'WARNING'}, f"NMF cache not written: {e}")
+        return nodes
+
+    def import_file(self, context, stats: ImportStats) -> List[Any]:
+        nmf_path = self.filepath
+        nodes = self.load_nodes(nmf_path, stats)
+        stats.count('nodes', len(nodes))
+        if self.texture_binding == 'ATLAS':
+            pages_dir = bpy.path.abspath(self.texture_pages_dir) if self.texture_pages_dir else os.path.dirname(nmf_path)
+            _bound, skipped = apply_atlas_binding(nodes, pages_dir)
+            for name, reason in skipped:
+                self.report({'WARNING'}, f"{name}: not bound to a texture page ({reason})")
+        if self.mesh_shape_keys:
+            # после кэша: в кэше остаётся сырой mesh_anim
+            stats.count('shape_key_meshes', apply_mesh_shape_frames(nodes))
+        if self.reduce_keys:
+            # после кэша: в кэше остаются исходные ключи
+            report = reduce_keyframes(nodes, {'translation': self.key_tolerance_location,
+                                              'rotation': self.key_tolerance_rotation,
+                                              'scaling': self.key_tolerance_scale})
+            stats.count('keyframes_removed', report['keys_before'] - report['keys_after'])
+
+        # узлы строятся и анимируются отдельными проходами; отложенные задачи — свои шаги
+        stats.progress_begin(2 * len(nodes) + (count_deferred(nodes) if self.progressive else 0))
+
+        # optional collection
+        if self.create_collection:
+            base = os.path.splitext(os.path.basename(nmf_path))[0]
+            col = ensure_collection(f"NMF_{base}")
+            # switch active collection to it during import
+            with context.temp_override(collection=col):
+                deferred = build_scene_from_nodes(nodes, share_meshes=self.share_meshes,
+                                                  stats=stats, progressive=self.progressive)
+        else:
+            deferred = build_scene_from_nodes(nodes, share_meshes=self.share_meshes,
+                                              stats=stats, progressive=self.progressive)
+
+        return deferred
+
 # ---------------- menu & register ----------------
 
 def menu_func_import(self, context):